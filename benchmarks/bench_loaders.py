@@ -0,0 +1,60 @@
+"""Benchmark the fast pattern loader against diffpy.utils.
+
+Writes a pattern file with two columns and 100k points by default,
+then reports the best time of several loads with ``load_pattern`` and
+with ``load_data``, and checks that both return the same columns.
+
+Usage::
+
+    python benchmarks/bench_loaders.py [--n-points N] [--repeat R]
+"""
+
+import argparse
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+from diffpy.labpdfproc.loaders import load_pattern
+from diffpy.utils.parsers import load_data
+
+
+def write_pattern(filepath, n_points):
+    """Write a pattern file with a header and n_points rows of 2theta
+    and intensity."""
+    x = np.linspace(1, 180, n_points)
+    y = np.random.default_rng(0).random(n_points)
+    with open(filepath, "w") as f:
+        f.write("# 2theta intensity\n")
+        np.savetxt(f, np.column_stack([x, y]), fmt="%.6f")
+
+
+def best_time(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n-points", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = Path(tmp_dir) / "pattern.xy"
+        write_pattern(filepath, args.n_points)
+        if not np.array_equal(
+            load_pattern(filepath), load_data(filepath, unpack=True)
+        ):
+            raise RuntimeError("load_pattern and load_data disagree.")
+        fast_time = best_time(lambda: load_pattern(filepath), args.repeat)
+        reference_time = best_time(
+            lambda: load_data(filepath, unpack=True), args.repeat
+        )
+    print(f"{args.n_points} points, best of {args.repeat} loads")
+    print(f"load_pattern: {fast_time * 1e3:8.1f} ms")
+    print(f"load_data:    {reference_time * 1e3:8.1f} ms")
+    print(f"speedup:      {reference_time / fast_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
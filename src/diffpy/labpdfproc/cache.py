@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+# Maximum total size of the cached cve files in MB.
+# The least recently used files are removed beyond this size.
+CACHE_SIZE_LIMIT_MB = 256
+CACHE_DIR_ENV = "LABPDFPROC_CACHE_DIR"
+_CACHE_SUFFIX = ".npy"
+
+
+def get_cache_dir(cache_dir=None):
+    """Return the directory of the cve cache.
+
+    It is determined as follows:
+    If cache_dir is provided, use it.
+    Otherwise, use the directory in the environment variable
+    ``LABPDFPROC_CACHE_DIR`` if it is set,
+    or the ``labpdfproc`` directory in the user cache directory
+    of the platform.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        The cache directory.
+
+    Returns
+    -------
+    cache_dir : Path
+        The full path to the cache directory.
+    """
+    if cache_dir is not None:
+        return Path(cache_dir).expanduser().resolve()
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV]).expanduser().resolve()
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA", Path.home() / "AppData/Local")
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+    return Path(base).resolve() / "labpdfproc"
+
+
+def get_cache_key(**fields):
+    """Return a key identifying a cached cve from the fields that
+    determine its values, e.g., method, mu*D, grid resolution, angle
+    grid and package version.
+
+    Parameters
+    ----------
+    **fields
+        The fields of the key. Values must be JSON serializable.
+
+    Returns
+    -------
+    key : str
+        The hexadecimal SHA-256 digest of the fields.
+    """
+    serialized = json.dumps(fields, sort_keys=True, default=repr)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def load_cve(key, cache_dir=None):
+    """Load a cached cve, marking it as recently used.
+
+    The cache is only an optimization, so a cache that cannot be read,
+    e.g., a missing or read-only directory, is treated as a cache miss.
+
+    Parameters
+    ----------
+    key : str
+        The key of the cve, see ``get_cache_key``.
+    cache_dir : str or Path, optional
+        The cache directory, see ``get_cache_dir``.
+
+    Returns
+    -------
+    cve : ndarray or None
+        The cached cve, or None if it is not in the cache.
+    """
+    path = get_cache_dir(cache_dir) / f"{key}{_CACHE_SUFFIX}"
+    try:
+        cve = np.load(path, allow_pickle=False)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # Another process may have removed or is replacing the file,
+        # the file is damaged or cannot be read. Treat it as a cache miss.
+        _remove(path)
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        # The cache may be read-only, the cve can still be used
+        pass
+    return cve
+
+
+def save_cve(key, cve, cache_dir=None, size_limit_mb=None):
+    """Save a cve to the cache and evict the least recently used files
+    beyond the size limit.
+
+    The file is written to a temporary file in the cache directory and
+    then renamed, so that concurrent readers never see a partial file.
+    If the cache cannot be written, e.g., a missing or read-only
+    directory, a warning is issued and the cve is not cached.
+
+    Parameters
+    ----------
+    key : str
+        The key of the cve, see ``get_cache_key``.
+    cve : ndarray
+        The cve to cache.
+    cache_dir : str or Path, optional
+        The cache directory, see ``get_cache_dir``.
+    size_limit_mb : float, optional
+        The maximum total size of the cache in MB.
+        Default is ``CACHE_SIZE_LIMIT_MB``.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    size_limit_mb = (
+        CACHE_SIZE_LIMIT_MB if size_limit_mb is None else size_limit_mb
+    )
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(cve), allow_pickle=False)
+            os.replace(tmp_path, cache_dir / f"{key}{_CACHE_SUFFIX}")
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        _evict(cache_dir, size_limit_mb * 1024**2)
+    except OSError as error:
+        warnings.warn(
+            f"Cannot write to the cache directory {cache_dir}: {error}. "
+            f"Proceeding without caching."
+        )
+
+
+def clear_cache(cache_dir=None):
+    """Remove all cached cve files.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        The cache directory, see ``get_cache_dir``.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    if not cache_dir.is_dir():
+        return
+    for path in cache_dir.glob(f"*{_CACHE_SUFFIX}"):
+        _remove(path)
+
+
+def _evict(cache_dir, size_limit):
+    """Remove the least recently used files until the total size is
+    within size_limit bytes."""
+    entries = []
+    for path in cache_dir.glob(f"*{_CACHE_SUFFIX}"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= size_limit:
+            break
+        _remove(path)
+        total_size -= size
+
+
+def _remove(path):
+    """Remove a file, ignoring it if another process already did or if
+    the cache is read-only."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
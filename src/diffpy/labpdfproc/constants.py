@@ -0,0 +1,29 @@
+"""Methods, defaults and allowed values shared by the numerical modules
+and the command-line application.
+
+This module does not import numpy, so that parsing arguments stays
+fast.
+"""
+
+# Allowed values of xtype, as in diffpy.utils.diffraction_objects
+XTYPES = ["angle", "tth", "twotheta", "2theta", "d", "dspace", "q"]
+CVE_METHODS = [
+    "brute_force",
+    "polynomial_interpolation",
+    "path_length_histogram",
+    "quadrature",
+    "monte_carlo",
+    "lookup_table",
+    "analytic",
+]
+# Methods that can evaluate the cve at arbitrary angles
+DIRECT_CVE_METHODS = ["polynomial_interpolation", "lookup_table", "analytic"]
+N_POINTS_ON_DIAMETER = 300
+# The default 2theta grid, on which the tables shipped with the package
+# are defined
+TTH_MIN = 1
+TTH_MAX = 180
+TTH_STEP = 0.1
+# Defaults of the polynomial interpolation tables
+REFERENCE_MUD = 1
+POLYNOMIAL_DEGREE = 6
@@ -1,10 +1,21 @@
 import argparse
 import os
+import queue
 import sys
-
-from gooey import Gooey, GooeyParser
-
-from diffpy.labpdfproc.functions import CVE_METHODS, apply_corr, compute_cve
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from diffpy.labpdfproc.constants import (
+    CVE_METHODS,
+    DIRECT_CVE_METHODS,
+    N_POINTS_ON_DIAMETER,
+    POLYNOMIAL_DEGREE,
+    REFERENCE_MUD,
+    TTH_MAX,
+    TTH_MIN,
+    TTH_STEP,
+    XTYPES,
+)
 from diffpy.labpdfproc.tools import (
     WAVELENGTHS,
     load_metadata,
@@ -12,8 +23,9 @@ from diffpy.labpdfproc.tools import (
     preprocessing_args,
     set_wavelength,
 )
-from diffpy.utils.diffraction_objects import XQUANTITIES, DiffractionObject
-from diffpy.utils.parsers import load_data
+
+# Number of files waiting between the stages of the --stream pipeline
+STREAM_QUEUE_SIZE = 4
 
 
 def _running_in_gui():
@@ -43,7 +55,7 @@ def _add_common_args(parser, use_gui=False):
         "--xtype",
         help=(
             "X-axis type (default: tth). Allowed values: "
-            f"{', '.join(XQUANTITIES)}"
+            f"{', '.join(XTYPES)}"
         ),
         default="tth",
     )
@@ -58,6 +70,132 @@ def _add_common_args(parser, use_gui=False):
         default="polynomial_interpolation",
         choices=CVE_METHODS,
     )
+    parser.add_argument(
+        "--direct",
+        help=(
+            "Evaluate the CVE directly at the angles of each input file "
+            "instead of interpolating it from the global 2theta grid. "
+            f"Allowed with the methods {', '.join(DIRECT_CVE_METHODS)}."
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--tth-range",
+        help=(
+            "Range of the global 2theta grid on which the CVE is computed, "
+            f"in degrees (default: {TTH_MIN} {TTH_MAX}). "
+            "The brute-force based methods only compute these angles."
+        ),
+        nargs=2,
+        type=float,
+        metavar=("MIN", "MAX"),
+        default=None,
+    )
+    parser.add_argument(
+        "--tth-step",
+        help=(
+            "Step of the global 2theta grid in degrees "
+            f"(default: {TTH_STEP})."
+        ),
+        type=float,
+        default=TTH_STEP,
+    )
+    parser.add_argument(
+        "--fit-tth-range",
+        help=(
+            "Fit the range of the global 2theta grid to the angles "
+            "of each input file instead of using --tth-range."
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--manifest",
+        help=(
+            "CSV or JSON file giving the correction parameters of "
+            "each input file, which replace those on the command line. "
+            "Each CSV row or JSON object has a 'file' entry, relative to "
+            "the manifest, and any of mud, wavelength, method, or "
+            "sample_composition, sample_mass_density and diameter "
+            "to compute mu*D."
+        ),
+        default=None,
+        **({"widget": "FileChooser"} if use_gui else {}),
+    )
+    parser.add_argument(
+        "--header-parameters",
+        help=(
+            "Read the correction parameters of each input file from "
+            "'key = value' lines in its header, with the same keys as "
+            "--manifest. Values in the manifest take precedence."
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        help=(
+            "Number of processes used to compute the CVE "
+            "(default: 1). Use -1 to use all available CPUs. "
+            "Applies to the brute_force, path_length_histogram, "
+            "quadrature and monte_carlo methods and to the brute-force "
+            "fallback of polynomial_interpolation."
+        ),
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help=(
+            "Number of processes used to correct the input files "
+            "(default: 1). Use -1 to use all available CPUs. "
+            "The correction of each group of files with the same "
+            "parameters is computed once and shared with the processes."
+        ),
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--stream",
+        help=(
+            "Read the next input file and write the previous one while "
+            "correcting the current one, using reader and writer threads "
+            "with a bounded number of files in memory. "
+            "Only used when --jobs is 1."
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--tables-dir",
+        help=(
+            "Directory of polynomial interpolation tables built with "
+            "'labpdfproc build-tables'. Defaults to the tables shipped "
+            "with the package, which cover mu*d from 0.5 to 7."
+        ),
+        default=None,
+        **({"widget": "DirChooser"} if use_gui else {}),
+    )
+    parser.add_argument(
+        "--no-cache",
+        help=(
+            "Do not read or write the on-disk cache of computed CVE curves."
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        help="Remove all cached CVE curves before processing.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help=(
+            "Directory of the on-disk CVE cache. Defaults to the "
+            "LABPDFPROC_CACHE_DIR environment variable if set, "
+            "otherwise to the user cache directory of the platform."
+        ),
+        default=None,
+        **({"widget": "DirChooser"} if use_gui else {}),
+    )
     parser.add_argument(
         "-o",
         "--output-directory",
@@ -134,50 +272,316 @@ def _save_corrected(corrected, input_path, args):
     outfile = args.output_directory / (f"{input_path.stem}-mud-corrected.chi")
     corrected.metadata = corrected.metadata or {}
     corrected.dump(str(outfile), xtype=args.xtype)
-    print(f"Saved corrected data to {outfile}")
+    return f"Saved corrected data to {outfile}"
 
 
 def _save_correction(correction, input_path, args):
     corrfile = args.output_directory / (f"{input_path.stem}-cve.chi")
     correction.metadata = correction.metadata or {}
     correction.dump(str(corrfile), xtype=args.xtype)
-    print(f"Saved correction data to {corrfile}")
+    return f"Saved correction data to {corrfile}"
+
 
+def _load_xy(path):
+    from diffpy.labpdfproc.loaders import load_pattern
+
+    columns = load_pattern(path)
+    if columns.ndim != 2 or len(columns) < 2:
+        raise ValueError(
+            f"Cannot find x and y columns in {path}. "
+            f"Please provide a file with two or three columns of data."
+        )
+    return columns[0], columns[1]
+
+
+def _to_pattern(x, y, args, wavelength, scat_quantity, name, metadata):
+    from diffpy.utils.diffraction_objects import DiffractionObject
 
-def _load_pattern(path, xtype, wavelength, metadata):
-    x, y = load_data(path, unpack=True)
     return DiffractionObject(
         xarray=x,
         yarray=y,
-        xtype=xtype,
+        xtype=args.xtype,
         wavelength=wavelength,
-        scat_quantity="x-ray",
-        name=path.stem,
+        scat_quantity=scat_quantity,
+        name=name,
         metadata=metadata,
     )
 
 
+def _group_by_parameters(args):
+    """Group the input files by their correction parameters, in the
+    order in which each group first appears."""
+    groups = {}
+    for path, parameters in zip(args.input_paths, args.file_parameters):
+        key = tuple(sorted(parameters.items()))
+        groups.setdefault(key, (parameters, []))[1].append(path)
+    return list(groups.values())
+
+
+def _method_options(args, method):
+    return (
+        {"tables_dir": args.tables_dir}
+        if method == "polynomial_interpolation" and args.tables_dir
+        else {}
+    )
+
+
+def _load_file(path, parameters, args):
+    """Load an input file and the metadata of its outputs."""
+    metadata = load_metadata(args, path, parameters)
+    x, y = _load_xy(path)
+    return metadata, x, y
+
+
+def _correct_loaded_file(
+    path, parameters, args, tth_grid, cve_memo, cache, metadata, x, y
+):
+    """Correct a loaded input file.
+
+    Returns the diffraction objects to save and their save functions.
+    """
+    from diffpy.labpdfproc.functions import (
+        apply_cve_array,
+        cve_array,
+        fit_tth_grid,
+        x_to_tth,
+    )
+
+    wavelength, method = parameters["wavelength"], parameters["method"]
+    tth = x_to_tth(x, args.xtype, wavelength)
+    if args.fit_tth_range:
+        tth_grid = fit_tth_grid(tth, args.tth_step)
+    cve = cve_array(
+        tth,
+        "tth",
+        wavelength,
+        parameters["mud"],
+        method=method,
+        workers=args.workers,
+        cache=cache,
+        memo=cve_memo,
+        direct=args.direct,
+        tth_grid=tth_grid,
+        **_method_options(args, method),
+    )
+    corrected_data = _to_pattern(
+        x,
+        apply_cve_array(y, cve, out=y),
+        args,
+        wavelength,
+        "x-ray",
+        f"Absorption corrected input_data: {path.stem}",
+        metadata.copy(),
+    )
+    outputs = [(corrected_data, _save_corrected)]
+    if args.output_correction:
+        correction = _to_pattern(
+            x,
+            cve,
+            args,
+            wavelength,
+            "cve",
+            f"absorption correction, cve, for {path.stem}",
+            metadata.copy(),
+        )
+        outputs.append((correction, _save_correction))
+    return outputs
+
+
+def _save_outputs(path, outputs, args):
+    """Save the outputs of an input file, returning the log lines."""
+    return [save(pattern, path, args) for pattern, save in outputs]
+
+
+def _correct_file(path, parameters, args, tth_grid, cve_memo, cache):
+    """Correct an input file and save the outputs.
+
+    Returns the log lines of the file.
+    """
+    loaded = _load_file(path, parameters, args)
+    outputs = _correct_loaded_file(
+        path, parameters, args, tth_grid, cve_memo, cache, *loaded
+    )
+    return _save_outputs(path, outputs, args)
+
+
+def _try(function, *args):
+    """Return the result of function(*args) and None,
+    or None and the error message if it failed."""
+    try:
+        return function(*args), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+
+def _try_correct_file(path, parameters, args, tth_grid, cve_memo, cache):
+    """Correct an input file, returning its log lines and the error
+    message if it failed."""
+    log_lines, error = _try(
+        _correct_file, path, parameters, args, tth_grid, cve_memo, cache
+    )
+    return log_lines or [], error
+
+
+def _stream_correct_files(tasks, args, tth_grid, cve_memo, cache):
+    """Correct the input files with reading, correcting and writing
+    overlapped.
+
+    A reader thread loads the files and a correcting thread corrects
+    them, while the outputs are written in the calling thread. The
+    queues between the threads hold at most ``STREAM_QUEUE_SIZE`` files,
+    so the memory use does not depend on the number of files.
+
+    Yields the log lines and the error message of each file
+    in input order.
+    """
+    loaded_files = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    corrected_files = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    def read():
+        for path, parameters in tasks:
+            loaded_files.put(_try(_load_file, path, parameters, args))
+
+    def correct():
+        for path, parameters in tasks:
+            loaded, error = loaded_files.get()
+            if error is None:
+                corrected_files.put(
+                    _try(
+                        _correct_loaded_file,
+                        path,
+                        parameters,
+                        args,
+                        tth_grid,
+                        cve_memo,
+                        cache,
+                        *loaded,
+                    )
+                )
+            else:
+                corrected_files.put((None, error))
+
+    for stage in (read, correct):
+        threading.Thread(target=stage, daemon=True).start()
+    for path, _ in tasks:
+        outputs, error = corrected_files.get()
+        log_lines = None
+        if error is None:
+            log_lines, error = _try(_save_outputs, path, outputs, args)
+        yield log_lines or [], error
+
+
+# Arguments shared by all files, set once in each worker process
+_worker_state = {}
+
+
+def _init_worker(args, tth_grid, cve_memo, cache):
+    _worker_state.update(
+        args=args, tth_grid=tth_grid, cve_memo=cve_memo, cache=cache
+    )
+
+
+def _correct_file_in_worker(task):
+    return _try_correct_file(*task, **_worker_state)
+
+
+def _precompute_cves(groups, args, tth_grid, cve_memo, cache):
+    """Compute the cve on the global grid of each group of files into
+    cve_memo, so that it is shared with the worker processes."""
+    from diffpy.labpdfproc.functions import cve_array
+
+    if args.direct or args.fit_tth_range:
+        # The cve then depends on the angles of each file
+        return
+    for parameters, _ in groups:
+        try:
+            cve_array(
+                tth_grid,
+                "tth",
+                parameters["wavelength"],
+                parameters["mud"],
+                method=parameters["method"],
+                workers=args.workers,
+                cache=cache,
+                memo=cve_memo,
+                tth_grid=tth_grid,
+                **_method_options(args, parameters["method"]),
+            )
+        except Exception:
+            # The error is reported for each file of the group
+            pass
+
+
 def apply_absorption_correction(args):
-    """Process all input files with absorption correction."""
-    for path in args.input_paths:
-        metadata = load_metadata(args, path)
-        pattern = _load_pattern(path, args.xtype, args.wavelength, metadata)
-        correction = compute_cve(
-            pattern, args.mud, method=args.method, xtype=args.xtype
+    """Process all input files with absorption correction.
+
+    Files are corrected in input order, with --stream in a pipeline of
+    reader and writer threads, or in --jobs processes, with the log lines
+    always printed in input order. A file that fails is
+    reported and the remaining files are still processed.
+
+    Returns
+    -------
+    failed_paths : list of Path
+        The input files that could not be corrected.
+    """
+    from diffpy.labpdfproc.cache import clear_cache
+    from diffpy.labpdfproc.functions import make_tth_grid
+
+    if args.clear_cache:
+        clear_cache(args.cache_dir)
+    cache = False if args.no_cache else (args.cache_dir or True)
+    # The cve on the global grid only depends on mu*D, method and grid,
+    # so it is computed once for each group of files with the same
+    # correction parameters and resampled for each file.
+    cve_memo = {}
+    tth_min, tth_max = args.tth_range or (TTH_MIN, TTH_MAX)
+    tth_grid = make_tth_grid(tth_min, tth_max, args.tth_step)
+    tasks = list(zip(args.input_paths, args.file_parameters))
+    jobs = os.cpu_count() if args.jobs == -1 else args.jobs
+    jobs = max(1, min(jobs, len(tasks)))
+    if jobs == 1 and args.stream:
+        results = _stream_correct_files(tasks, args, tth_grid, cve_memo, cache)
+        return _report_results(tasks, results)
+    if jobs == 1:
+        results = (
+            _try_correct_file(*task, args, tth_grid, cve_memo, cache)
+            for task in tasks
         )
-        correction.metadata = metadata.copy()
-        corrected_data = apply_corr(pattern, correction)
-        corrected_data.name = (
-            f"Absorption corrected input_data: {pattern.name}"
+        return _report_results(tasks, results)
+    _precompute_cves(
+        _group_by_parameters(args), args, tth_grid, cve_memo, cache
+    )
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(args, tth_grid, cve_memo, cache),
+    ) as executor:
+        results = executor.map(
+            _correct_file_in_worker,
+            tasks,
+            chunksize=max(1, len(tasks) // (4 * jobs)),
         )
-        corrected_data.metadata = metadata.copy()
-        _save_corrected(corrected_data, path, args)
-        if args.output_correction:
-            _save_correction(correction, path, args)
+        return _report_results(tasks, results)
+
+
+def _report_results(tasks, results):
+    """Print the log lines and errors of each file in input order."""
+    failed_paths = []
+    for (path, _), (log_lines, error) in zip(tasks, results):
+        for line in log_lines:
+            print(line)
+        if error is not None:
+            print(f"Failed to correct {path}: {error}", file=sys.stderr)
+            failed_paths.append(path)
+    return failed_paths
 
 
 def create_parser(use_gui=False):
-    Parser = GooeyParser if use_gui else argparse.ArgumentParser
+    if use_gui:
+        from gooey import GooeyParser as Parser
+    else:
+        Parser = argparse.ArgumentParser
 
     # Force no colors when gui is running to avoid ANSI escape codes
     # in Gooey output
@@ -273,6 +677,75 @@ def create_parser(use_gui=False):
     )
     _add_common_args(sample_parser, use_gui)
 
+    # BUILD-TABLES parser
+    tables_parser = subp.add_parser(
+        "build-tables",
+        help=(
+            "Build polynomial interpolation tables "
+            "for a list of mu*d values"
+        ),
+    )
+    tables_parser.add_argument(
+        "output_directory",
+        help="Directory to write the table files to (created if needed).",
+        **({"widget": "DirChooser"} if use_gui else {}),
+    )
+    tables_parser.add_argument(
+        "--mud-list",
+        nargs="+",
+        type=float,
+        required=True,
+        help=(
+            "mu*d values at which the polynomials are fitted, at least "
+            "three. The tables cover the range from the smallest to the "
+            "largest value."
+        ),
+    )
+    tables_parser.add_argument(
+        "--n-points-on-diameter",
+        type=int,
+        default=N_POINTS_ON_DIAMETER,
+        help=(
+            "Number of points on the diameter of the brute-force grid "
+            f"(default: {N_POINTS_ON_DIAMETER})."
+        ),
+    )
+    tables_parser.add_argument(
+        "--reference-mud",
+        type=float,
+        default=REFERENCE_MUD,
+        help=(
+            "mu*d whose inverse CVE is the variable of the polynomials "
+            f"(default: {REFERENCE_MUD})."
+        ),
+    )
+    tables_parser.add_argument(
+        "--degree",
+        type=int,
+        default=POLYNOMIAL_DEGREE,
+        help=f"Degree of the polynomials (default: {POLYNOMIAL_DEGREE}).",
+    )
+    tables_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of processes used for the brute-force computation "
+            "(default: 1). Use -1 to use all available CPUs."
+        ),
+    )
+    tables_parser.add_argument(
+        "--checkpoint-dir",
+        default=None,
+        help=(
+            "Directory in which the brute-force result of each mu*d is "
+            "saved as soon as it is computed, so that an interrupted run "
+            "can be resumed. Defaults to the checkpoint directory in the "
+            "output directory."
+        ),
+        **({"widget": "DirChooser"} if use_gui else {}),
+    )
+
     return parser
 
 
@@ -293,15 +766,21 @@ def _handle_old_api_conversion(args):
     return args
 
 
-@Gooey(
-    program_name="labpdfproc",
-    required_cols=1,
-    optional_cols=1,
-    show_sidebar=True,
-)
 def get_args_gui():
-    parser = create_parser(use_gui=True)
-    return parser.parse_args()
+    # Gooey and its GUI toolkit are only imported when the GUI is used
+    from gooey import Gooey
+
+    @Gooey(
+        program_name="labpdfproc",
+        required_cols=1,
+        optional_cols=1,
+        show_sidebar=True,
+    )
+    def parse_args():
+        parser = create_parser(use_gui=True)
+        return parser.parse_args()
+
+    return parse_args()
 
 
 def get_args_cli(override=None):
@@ -311,12 +790,40 @@ def get_args_cli(override=None):
     return parser.parse_args(argv)
 
 
+def build_tables(args):
+    """Build the polynomial interpolation tables and report the fit
+    error of each mu*D."""
+    from diffpy.labpdfproc.tables import build_polynomial_tables
+
+    fit_errors = build_polynomial_tables(
+        args.mud_list,
+        args.output_directory,
+        n_points_on_diameter=args.n_points_on_diameter,
+        reference_mud=args.reference_mud,
+        degree=args.degree,
+        workers=args.workers,
+        checkpoint_dir=args.checkpoint_dir,
+    )
+    print(f"Polynomial tables written to {args.output_directory}.")
+    print("mu*d    maximum relative error of the fitted CVE")
+    for mud, fit_error in zip(sorted(set(args.mud_list)), fit_errors):
+        print(f"{mud:<8g}{fit_error:.2e}")
+
+
 def main():
     use_gui = len(sys.argv) == 1 or "--gui" in sys.argv
     args = get_args_gui() if use_gui else get_args_cli()
+    if args.command == "build-tables":
+        build_tables(args)
+        return
     args = _handle_old_api_conversion(args)
     args = preprocessing_args(args)
-    apply_absorption_correction(args)
+    failed_paths = apply_absorption_correction(args)
+    if failed_paths:
+        sys.exit(
+            f"Failed to correct {len(failed_paths)} of "
+            f"{len(args.input_paths)} input files."
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import numpy as np
+
+# Numbers of columns read by the fast path, e.g., .xy and .chi files
+# with x and y, and .xye files with x, y and the uncertainty of y
+FAST_PATH_N_COLUMNS = (2, 3)
+# Number of consecutive rows with the same number of columns
+# that start the data block, as in diffpy.utils.parsers.load_data
+MIN_ROWS = 10
+
+
+def _count_values(line):
+    """Return the number of values of a line of numbers, or 0 if the
+    line has other words."""
+    words = line.split()
+    try:
+        for word in words:
+            float(word)
+    except ValueError:
+        return 0
+    return len(words)
+
+
+def _find_data_block(filepath):
+    """Return the number of lines before the data block and its number
+    of columns, or None if the file is not read by the fast path.
+
+    The data block starts with the first ``MIN_ROWS`` consecutive lines
+    of numbers with the same number of columns, as in ``load_data``.
+    """
+    start = n_columns = None
+    n_rows = 0
+    with open(filepath, "rb") as f:
+        for line_number, line in enumerate(f):
+            if b"\r" in line.rstrip(b"\r\n"):
+                # Lines separated by a lone carriage return would be
+                # counted differently by numpy
+                return None
+            n_values = _count_values(line)
+            if n_values == 0:
+                start = None
+                continue
+            if start is None or n_values != n_columns:
+                start, n_columns, n_rows = line_number, n_values, 0
+            n_rows += 1
+            if n_rows >= MIN_ROWS:
+                if n_columns not in FAST_PATH_N_COLUMNS:
+                    return None
+                return start, n_columns
+    return None
+
+
+def load_pattern(filepath):
+    """Load the columns of a diffraction pattern file with two or three
+    columns, e.g., .xy, .chi or .xye files.
+
+    The data block is found as in ``diffpy.utils.parsers.load_data``,
+    reading only the header and the first rows, and is then parsed in
+    bulk by the C reader of ``numpy.loadtxt`` directly from the file.
+    Files with another layout, e.g., fewer than ``MIN_ROWS`` rows or rows
+    with different numbers of columns, are loaded with ``load_data``,
+    so the columns are always the same as with ``load_data``.
+
+    Parameters
+    ----------
+    filepath : str or Path
+        The pattern file.
+
+    Returns
+    -------
+    columns : ndarray
+        The columns of the data block, with shape
+        (number of columns, number of rows).
+    """
+    data_block = _find_data_block(filepath)
+    if data_block is not None:
+        start, n_columns = data_block
+        try:
+            return np.loadtxt(
+                filepath,
+                skiprows=start,
+                usecols=range(n_columns),
+                ndmin=2,
+                unpack=True,
+            )
+        except ValueError:
+            pass
+    from diffpy.utils.parsers import load_data
+
+    return load_data(filepath, unpack=True)
@@ -1,19 +1,10 @@
 import copy
+import csv
+import json
+import warnings
 from pathlib import Path
 
-from diffpy.utils.diffraction_objects import (
-    ANGLEQUANTITIES,
-    QQUANTITIES,
-    XQUANTITIES,
-)
-from diffpy.utils.tools import (
-    _load_config,
-    check_and_build_global_config,
-    compute_mu_using_xraydb,
-    compute_mud,
-    get_package_info,
-    get_user_info,
-)
+from diffpy.labpdfproc.constants import CVE_METHODS, DIRECT_CVE_METHODS
 
 # Reference values are taken from
 # https://x-server.gmca.aps.anl.gov/cgi/www_dbli.exe?x0hdb=waves
@@ -43,7 +34,32 @@ METADATA_KEYS_TO_EXCLUDE = [
     "input_paths",
     "force",
     "energy",
+    "workers",
+    "no_cache",
+    "clear_cache",
+    "cache_dir",
+    "tables_dir",
+    "direct",
+    "tth_range",
+    "tth_step",
+    "fit_tth_range",
+    "manifest",
+    "header_parameters",
+    "file_parameters",
+    "jobs",
+    "stream",
 ]
+# Correction parameters that can be given for each input file
+# in a manifest or in the header of the file
+FILE_PARAMETERS = [
+    "mud",
+    "wavelength",
+    "method",
+    "sample_composition",
+    "sample_mass_density",
+    "diameter",
+]
+_SAMPLE_PARAMETERS = ["sample_composition", "sample_mass_density", "diameter"]
 
 
 def set_output_directory(args):
@@ -160,7 +176,8 @@ def set_input_lists(args):
                 f"Cannot find {input_name}. "
                 f"Please specify valid input file(s) or directories."
             )
-    setattr(args, "input_paths", list(set(input_paths)))
+    # Remove duplicates, keeping the input order
+    setattr(args, "input_paths", list(dict.fromkeys(input_paths)))
     return args
 
 
@@ -187,25 +204,30 @@ def normalize_wavelength(args):
     ValueError
         If a string wavelength is not a known source.
     """
-    if args.wavelength is None:
-        return args
+    args.wavelength = _normalize_wavelength_value(args.wavelength)
+    return args
+
+
+def _normalize_wavelength_value(wavelength):
+    """Convert a wavelength or anode type to a float wavelength, see
+    ``normalize_wavelength``."""
+    if wavelength is None:
+        return None
     try:
-        args.wavelength = float(args.wavelength)
-        return args
+        return float(wavelength)
     except (TypeError, ValueError):
         pass
-    key = str(args.wavelength).strip()
+    key = str(wavelength).strip()
     matched = next(
         (k for k in WAVELENGTHS if k.lower() == key.lower()),
         None,
     )
     if matched is None:
         raise ValueError(
-            f"Anode type '{args.wavelength}' not recognized. "
+            f"Anode type '{wavelength}' not recognized. "
             f"Please rerun specifying an anode type from {*known_sources, }."
         )
-    args.wavelength = WAVELENGTHS[matched]
-    return args
+    return WAVELENGTHS[matched]
 
 
 def load_wavelength_from_config_file(args):
@@ -224,6 +246,7 @@ def load_wavelength_from_config_file(args):
     args : argparse.Namespace
         The updated arguments with the updated wavelength and anode type.
     """
+    from diffpy.utils.tools import _load_config
 
     if args.wavelength is not None:
         return normalize_wavelength(args)
@@ -289,6 +312,8 @@ def set_wavelength(args):
     args : argparse.Namespace
         Updated arguments with args.wavelength as a float.
     """
+    from diffpy.utils.diffraction_objects import ANGLEQUANTITIES
+
     args = normalize_wavelength(args)
     if args.wavelength is None:
         if args.xtype not in ANGLEQUANTITIES:
@@ -321,6 +346,12 @@ def set_xtype(args):
     args : argparse.Namespace
         The updated arguments with the xtype as one of q, tth, or d.
     """
+    from diffpy.utils.diffraction_objects import (
+        ANGLEQUANTITIES,
+        QQUANTITIES,
+        XQUANTITIES,
+    )
+
     if args.xtype.lower() not in XQUANTITIES:
         raise ValueError(
             f"Unknown xtype: {args.xtype}. "
@@ -336,6 +367,8 @@ def set_xtype(args):
 
 def _set_mud_from_zscan(args):
     """Experimental estimation of mu*D from a z-scan file."""
+    from diffpy.utils.tools import compute_mud
+
     filepath = Path(args.z_scan_file).resolve()
     if not filepath.is_file():
         raise FileNotFoundError(
@@ -363,21 +396,37 @@ def _parse_theoretical_input(input_str):
     return sample_composition, energy, mass_density_or_packing_fraction
 
 
+def _compute_mud_from_density(
+    sample_composition, sample_mass_density, diameter, wavelength
+):
+    """Return the theoretical mu*D of a sample from its composition,
+    mass density and diameter, and the X-ray energy in keV of the
+    wavelength in angstroms."""
+    from diffpy.utils.tools import compute_mu_using_xraydb
+
+    energy = 12.398 / wavelength
+    mud = (
+        compute_mu_using_xraydb(
+            sample_composition,
+            energy,
+            sample_mass_density=sample_mass_density,
+        )
+        * diameter
+    )
+    return mud, energy
+
+
 def _set_theoretical_mud_from_density(args):
     """Theoretical estimation of mu*D from sample composition, energy,
     and sample mass density."""
     args = normalize_wavelength(args)
     if args.wavelength is None:
         args = load_wavelength_from_config_file(args)
-    energy = 12.398 / args.wavelength
-    args.energy = energy
-    args.mud = (
-        compute_mu_using_xraydb(
-            args.sample_composition,
-            args.energy,
-            sample_mass_density=args.sample_mass_density,
-        )
-        * args.diameter
+    args.mud, args.energy = _compute_mud_from_density(
+        args.sample_composition,
+        args.sample_mass_density,
+        args.diameter,
+        args.wavelength,
     )
     return args
 
@@ -385,6 +434,8 @@ def _set_theoretical_mud_from_density(args):
 def _set_theoretical_mud_from_packing(args):
     """Theoretical estimation of mu*D from sample composition, energy,
     and packing fraction."""
+    from diffpy.utils.tools import compute_mu_using_xraydb
+
     sample_composition, energy, packing_fraction = _parse_theoretical_input(
         args.theoretical_from_packing
     )
@@ -495,6 +546,11 @@ def load_user_info(args):
         The updated argparse Namespace
         with username, email, and orcid inserted.
     """
+    from diffpy.utils.tools import (
+        check_and_build_global_config,
+        get_user_info,
+    )
+
     if args.username is None or args.email is None:
         check_and_build_global_config()
     config = get_user_info(
@@ -523,11 +579,181 @@ def load_package_info(args):
         The updated argparse Namespace
         with diffpy.labpdfproc name and version inserted.
     """
+    from diffpy.utils.tools import get_package_info
+
     metadata = get_package_info("diffpy.labpdfproc")
     setattr(args, "package_info", metadata["package_info"])
     return args
 
 
+def _check_file_parameters(parameters, source):
+    """Raise a ValueError if the parameters of a file contain unknown
+    keys."""
+    unknown = sorted(set(parameters) - set(FILE_PARAMETERS))
+    if unknown:
+        raise ValueError(
+            f"Unknown parameters {*unknown, } in {source}. "
+            f"Allowed parameters are {*FILE_PARAMETERS, }."
+        )
+
+
+def load_manifest(manifest_file):
+    """Load the correction parameters of each input file from a manifest.
+
+    The manifest is either a CSV file with a header row, or a JSON file
+    with a list of objects. Each row or object has a ``file`` entry with
+    the path of an input file, absolute or relative to the directory of
+    the manifest, and any of ``FILE_PARAMETERS``. Empty CSV cells are
+    ignored.
+
+    Parameters
+    ----------
+    manifest_file : str or Path
+        The CSV or JSON manifest file.
+
+    Returns
+    -------
+    manifest : dict
+        The parameters of each file, keyed by the resolved path of the file.
+    """
+    manifest_file = Path(manifest_file).expanduser().resolve()
+    if not manifest_file.is_file():
+        raise FileNotFoundError(
+            f"Cannot find manifest {manifest_file}. "
+            f"Please specify a valid file path."
+        )
+    with open(manifest_file, newline="") as f:
+        if manifest_file.suffix.lower() == ".json":
+            entries = json.load(f)
+        else:
+            entries = [
+                {key: value for key, value in row.items() if value}
+                for row in csv.DictReader(f)
+            ]
+    if not isinstance(entries, list) or not all(
+        isinstance(entry, dict) and "file" in entry for entry in entries
+    ):
+        raise ValueError(
+            f"Invalid manifest {manifest_file}. Please provide a list of "
+            f"entries, each with a 'file' and its correction parameters."
+        )
+    manifest = {}
+    for entry in entries:
+        parameters = dict(entry)
+        filepath = Path(parameters.pop("file")).expanduser()
+        _check_file_parameters(parameters, manifest_file)
+        manifest[(manifest_file.parent / filepath).resolve()] = parameters
+    return manifest
+
+
+def _load_header_parameters(filepath):
+    """Load the correction parameters in ``key = value`` lines of the
+    header of an input file, with or without a leading ``#``."""
+    from diffpy.utils.parsers import load_data
+
+    try:
+        header = load_data(filepath, headers=True)
+    except (OSError, UnicodeDecodeError, ValueError):
+        # Unreadable files are reported when their data are loaded
+        return {}
+    parameters = {}
+    for key, value in header.items():
+        key = key.lstrip("#").strip().lower()
+        if key in FILE_PARAMETERS and value != "None":
+            parameters[key] = value
+    return parameters
+
+
+def _resolve_file_parameters(args, parameters, filepath):
+    """Return the mu*D, wavelength and method of a file from its
+    parameters, defaulting to those of args."""
+    wavelength = _normalize_wavelength_value(
+        parameters.get("wavelength", args.wavelength)
+    )
+    method = parameters.get("method", args.method)
+    if method not in CVE_METHODS:
+        raise ValueError(
+            f"Unknown method {method} for {filepath}. "
+            f"Allowed methods are {*CVE_METHODS, }."
+        )
+    sample_parameters = [
+        key for key in _SAMPLE_PARAMETERS if key in parameters
+    ]
+    if "mud" in parameters:
+        mud = float(parameters["mud"])
+    elif sample_parameters:
+        if len(sample_parameters) != len(_SAMPLE_PARAMETERS) or not wavelength:
+            raise ValueError(
+                f"Cannot compute mu*D for {filepath}. Please provide "
+                f"{*_SAMPLE_PARAMETERS, } and the wavelength."
+            )
+        mud, _ = _compute_mud_from_density(
+            parameters["sample_composition"],
+            float(parameters["sample_mass_density"]),
+            float(parameters["diameter"]),
+            wavelength,
+        )
+    else:
+        mud = float(args.mud)
+    return {"mud": mud, "wavelength": wavelength, "method": method}
+
+
+def set_file_parameters(args):
+    """Set the mu*D, wavelength and method of each input file.
+
+    They are taken from the command line, replaced by the values in the
+    header of the file with --header-parameters, which are in turn
+    replaced by those in the manifest with --manifest. A mu*D is
+    either given directly or computed from the sample composition,
+    mass density and diameter.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The arguments from the parser.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        The updated arguments with file_parameters,
+        a list of dictionaries with the mud, wavelength and method
+        of each file in input_paths.
+    """
+    manifest = load_manifest(args.manifest) if args.manifest else {}
+    args.file_parameters = []
+    for path in args.input_paths:
+        parameters = {}
+        if args.header_parameters:
+            parameters.update(_load_header_parameters(path))
+        parameters.update(manifest.pop(Path(path).resolve(), {}))
+        args.file_parameters.append(
+            _resolve_file_parameters(args, parameters, path)
+        )
+    if manifest:
+        warnings.warn(
+            f"The manifest {args.manifest} has entries for files "
+            f"that are not among the inputs: "
+            f"{', '.join(str(path) for path in manifest)}."
+        )
+    return args
+
+
+def _check_direct_methods(args):
+    """Check that the method of each input file can evaluate the cve
+    directly at its angles if --direct is used."""
+    if not args.direct:
+        return
+    for path, parameters in zip(args.input_paths, args.file_parameters):
+        method = parameters["method"]
+        if method not in DIRECT_CVE_METHODS:
+            source = "" if method == args.method else f" for {path}"
+            raise ValueError(
+                f"Method {method} cannot evaluate the cve directly "
+                f"at the input angles{source}. "
+                f"Allowed methods are {*DIRECT_CVE_METHODS, }."
+            )
+
+
 def _check_saved_file_exists(args):
     """Check if the output files already exist based on the input paths
     and output directory."""
@@ -552,7 +778,8 @@ def _check_saved_file_exists(args):
 def preprocessing_args(args):
     """Perform preprocessing on the provided args. The process includes
     loading package and user information, setting input, output,
-    wavelength, anode type, xtype, mu*D, and loading user metadata.
+    wavelength, anode type, xtype, mu*D, loading user metadata, and
+    setting the correction parameters of each input file.
 
     Parameters
     ----------
@@ -566,6 +793,9 @@ def preprocessing_args(args):
 
     Raises
     ------
+    ValueError
+        If --direct is used with a method that cannot evaluate the cve
+        directly at the input angles.
     FileExistsError
         If the output files already exist and --force is not used.
     """
@@ -578,12 +808,14 @@ def preprocessing_args(args):
     args = load_user_metadata(args)
     args = load_user_info(args)
     args = load_package_info(args)
+    args = set_file_parameters(args)
+    _check_direct_methods(args)
     _check_saved_file_exists(args)
     return args
 
 
 # Update load_metadata to use 'input_directory' consistently:
-def load_metadata(args, filepath):
+def load_metadata(args, filepath, parameters=None):
     """Load the relevant metadata from args to write into the header of
     the output files.
 
@@ -595,6 +827,10 @@ def load_metadata(args, filepath):
     filepath : Path
         The filepath of the current input file.
 
+    parameters : dict, optional
+        The correction parameters of the current input file,
+        see ``set_file_parameters``, which replace those in args.
+
     Returns
     -------
     metadata : dict
@@ -603,6 +839,8 @@ def load_metadata(args, filepath):
     metadata = copy.deepcopy(vars(args))
     for key in METADATA_KEYS_TO_EXCLUDE:
         metadata.pop(key, None)
+    if parameters is not None:
+        metadata.update(parameters)
     metadata["mud"] = round(float(metadata["mud"]), 4)
     metadata["input_directory"] = str(filepath)
     metadata["output_directory"] = str(metadata["output_directory"])
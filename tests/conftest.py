@@ -3,6 +3,16 @@ from pathlib import Path
 
 import pytest
 
+from diffpy.labpdfproc.cache import CACHE_DIR_ENV
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    # Keep the cve cache of the tests out of the user cache directory
+    cache_dir = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv(CACHE_DIR_ENV, str(cache_dir))
+    yield cache_dir
+
 
 @pytest.fixture
 def user_filesystem(tmp_path):
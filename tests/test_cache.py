@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from diffpy.labpdfproc.cache import (
+    CACHE_DIR_ENV,
+    clear_cache,
+    get_cache_dir,
+    get_cache_key,
+    load_cve,
+    save_cve,
+)
+
+
+def test_get_cache_dir(tmp_path, monkeypatch):
+    # C1: explicit directory, expect it to be used
+    assert get_cache_dir(tmp_path / "explicit") == tmp_path / "explicit"
+    # C2: directory set in the environment, expect it to be used
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "env"))
+    assert get_cache_dir() == tmp_path / "env"
+    # C3: nothing set, expect the user cache directory of the platform
+    monkeypatch.delenv(CACHE_DIR_ENV)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    monkeypatch.setattr("sys.platform", "linux")
+    assert get_cache_dir() == tmp_path / "xdg" / "labpdfproc"
+
+
+def test_get_cache_key():
+    key = get_cache_key(method="brute_force", mud=2.0)
+    assert key == get_cache_key(mud=2.0, method="brute_force")
+    assert key != get_cache_key(method="brute_force", mud=2.5)
+    assert key != get_cache_key(method="quadrature", mud=2.0)
+
+
+def test_save_and_load_cve(tmp_path):
+    cve = np.linspace(1, 2, 10)
+    # C1: key not in the cache, expect None
+    assert load_cve("key", tmp_path) is None
+    # C2: key saved to the cache, expect the saved cve
+    save_cve("key", cve, tmp_path)
+    assert np.array_equal(load_cve("key", tmp_path), cve)
+    assert not list(tmp_path.glob("*.tmp"))
+    # C3: damaged file, expect a cache miss and the file removed
+    (tmp_path / "damaged.npy").write_bytes(b"not a numpy file")
+    assert load_cve("damaged", tmp_path) is None
+    assert not (tmp_path / "damaged.npy").exists()
+
+
+def test_save_cve_evicts_least_recently_used(tmp_path):
+    cve = np.ones(1000)
+    for i, key in enumerate(["a", "b", "c"]):
+        save_cve(key, cve, tmp_path)
+        os.utime(tmp_path / f"{key}.npy", (i, i))
+    # "a" is read, so "b" becomes the least recently used
+    load_cve("a", tmp_path)
+    file_size = (tmp_path / "a.npy").stat().st_size
+    save_cve("d", cve, tmp_path, size_limit_mb=3.5 * file_size / 1024**2)
+    assert sorted(path.stem for path in tmp_path.glob("*.npy")) == [
+        "a",
+        "c",
+        "d",
+    ]
+
+
+def test_save_and_load_cve_unusable_cache(tmp_path):
+    # Case: the cache directory cannot be created,
+    # e.g., its parent is a file or a read-only filesystem
+    # expected: a warning when saving and a cache miss when loading
+    (tmp_path / "file").write_text("")
+    cache_dir = tmp_path / "file" / "cache"
+    with pytest.warns(UserWarning, match="Proceeding without caching."):
+        save_cve("key", np.ones(3), cache_dir)
+    assert load_cve("key", cache_dir) is None
+
+
+@pytest.mark.parametrize("exists", [True, False])
+def test_clear_cache(tmp_path, exists):
+    cache_dir = tmp_path / "cache"
+    if exists:
+        save_cve("key", np.ones(3), cache_dir)
+    clear_cache(cache_dir)
+    assert load_cve("key", cache_dir) is None
@@ -1,15 +1,32 @@
 import re
+import subprocess
+import sys
+import warnings
 
 import numpy as np
 import pytest
 
+from diffpy.labpdfproc import functions
 from diffpy.labpdfproc.functions import (
     CVE_METHODS,
+    DIRECT_CVE_METHODS,
+    TTH_GRID,
     Gridded_circle,
+    _get_exit_distances,
+    _get_quadrature_points,
+    _load_cve_table,
     apply_corr,
+    apply_cve_array,
     compute_cve,
+    compute_cve_curves,
+    compute_cve_monte_carlo,
+    cve_array,
+    cve_stack,
+    fit_tth_grid,
+    make_tth_grid,
 )
 from diffpy.utils.diffraction_objects import DiffractionObject
+from diffpy.utils.transforms import tth_to_d, tth_to_q
 
 
 @pytest.mark.parametrize(
@@ -36,7 +53,7 @@ def test_get_grid_points(inputs, expected_grid):
         n_points_on_diameter=inputs["n_points_on_diameter"],
         mu=inputs["mu"],
     )
-    actual_grid_sorted = sorted(actual_gs.grid)
+    actual_grid_sorted = sorted(map(tuple, actual_gs.grid))
     expected_grid_sorted = sorted(expected_grid)
     for actual_pt, expected_pt in zip(
         actual_grid_sorted, expected_grid_sorted
@@ -44,6 +61,29 @@ def test_get_grid_points(inputs, expected_grid):
         assert actual_pt == pytest.approx(expected_pt, rel=1e-4, abs=1e-6)
 
 
+@pytest.mark.parametrize(
+    "angle, expected_distances",
+    [
+        # Points (0, 0), (0.5, 0), (0, 0.5), (-0.5, -0.5), (1, 0)
+        # on the unit circle.
+        # C1: beam going forward along x, no tan singularity at 0 degrees
+        (0, [1, 0.5, np.sqrt(0.75), 0.5 + np.sqrt(0.75), 0]),
+        # C2: beam going up, no special case at 90 degrees
+        (90, [1, np.sqrt(0.75), 0.5, 0.5 + np.sqrt(0.75), 0]),
+        # C3: beam going backward along x
+        (180, [1, 1.5, np.sqrt(0.75), np.sqrt(0.75) - 0.5, 2]),
+    ],
+)
+def test_get_exit_distances(angle, expected_distances):
+    x = np.array([0, 0.5, 0, -0.5, 1])
+    y = np.array([0, 0, 0.5, -0.5, 0])
+    angle = np.radians(angle)
+    actual_distances = _get_exit_distances(
+        x, y, np.cos(angle), np.sin(angle), 1
+    )
+    assert actual_distances == pytest.approx(expected_distances, abs=1e-12)
+
+
 @pytest.mark.parametrize(
     "inputs, expected_distances",
     [
@@ -87,6 +127,75 @@ def test_set_distances_at_angle(inputs, expected_distances):
     )
 
 
+@pytest.mark.parametrize(
+    "angles",
+    [
+        # C1: angles within a single block
+        [30, 60, 120],
+        # C2: angles along, perpendicular and opposite to the beam
+        [0, 45, 90, 135, 179.9],
+        # C3: angles spanning more than one block
+        np.linspace(1, 179, 70),
+    ],
+)
+def test_sum_distances_and_muls_at_angles(angles):
+    actual_gs = Gridded_circle(radius=1, n_points_on_diameter=10, mu=1.5)
+    actual_distances, actual_muls = actual_gs.sum_distances_and_muls_at_angles(
+        angles
+    )
+    expected_distances, expected_muls = [], []
+    for angle in angles:
+        distances = np.array(
+            [
+                actual_gs._get_path_length(tuple(point), angle)[0]
+                for point in actual_gs.grid
+            ]
+        )
+        expected_distances.append(distances.sum())
+        expected_muls.append(np.exp(-1.5 * distances).sum())
+    assert actual_distances == pytest.approx(expected_distances, rel=1e-8)
+    assert actual_muls == pytest.approx(expected_muls, rel=1e-8)
+
+
+@pytest.mark.parametrize(
+    "memory_budget_mb, expected_n_tiles",
+    [
+        # C1: the whole grid fits in one tile
+        (512, 1),
+        # C2: 1e-3 MB / 8 arrays / (32 angles * 8 bytes) < 1,
+        # so every one of the 60 grid points is its own tile
+        (1e-3, 60),
+        # C3: 2e-2 MB gives 10 points per tile
+        (2e-2, 6),
+    ],
+)
+def test_sum_distances_and_muls_at_angles_memory_budget(
+    memory_budget_mb, expected_n_tiles
+):
+    # Test that the grid is split into tiles sized from the memory budget
+    # and that the sums accumulated over the tiles
+    # agree with the sums over the whole grid
+    angles = np.linspace(1, 179, 40)
+    actual_gs = Gridded_circle(
+        n_points_on_diameter=10, memory_budget_mb=memory_budget_mb
+    )
+    assert len(actual_gs._get_point_tiles()) == expected_n_tiles
+    actual_distances, actual_muls = actual_gs.sum_distances_and_muls_at_angles(
+        angles, mus=[0.5, 2]
+    )
+    actual_weights, _ = actual_gs.get_path_length_histograms(angles, 10)
+    expected_gs = Gridded_circle(n_points_on_diameter=10)
+    primary, secondary = expected_gs.get_path_lengths(angles)
+    expected_distances = (primary + secondary).sum(axis=1)
+    expected_muls = [
+        np.exp(-mu * (primary + secondary)).sum(axis=1) for mu in [0.5, 2]
+    ]
+    expected_weights, _ = expected_gs.get_path_length_histograms(angles, 10)
+    assert actual_distances == pytest.approx(expected_distances, rel=1e-12)
+    assert actual_muls == pytest.approx(np.array(expected_muls), rel=1e-12)
+    assert actual_weights == pytest.approx(expected_weights, rel=1e-12)
+
+
 @pytest.mark.parametrize(
     "input_mu, expected_muls",
     [
@@ -132,6 +241,20 @@ def test_set_muls_at_angle(input_mu, expected_muls):
             },
             {"mud": 20, "xtype": "q"},
         ),
+        (  # C4: User specified path-length histogram method
+            {
+                "xarray": np.array([5.1, 5.2, 5.3]),
+                "yarray": np.array([2, 2, 2]),
+            },
+            {"mud": 20, "method": "path_length_histogram", "xtype": "q"},
+        ),
+        (  # C5: User specified lookup-table method
+            {
+                "xarray": np.array([5.1, 5.2, 5.3]),
+                "yarray": np.array([2, 2, 2]),
+            },
+            {"mud": 2, "method": "lookup_table", "xtype": "q"},
+        ),
     ],
 )
 def test_compute_cve(mocker, input_diffraction_data, input_cve_params):
@@ -162,6 +285,167 @@ def test_compute_cve(mocker, input_diffraction_data, input_cve_params):
     assert actual_cve_do == expected_cve_do
 
 
+@pytest.mark.parametrize(
+    "method, muds, rel",
+    [
+        # C1: brute-force computation for several mu*D in one pass
+        ("brute_force", [0.5, 1, 2.5], 1e-12),
+        # C2: polynomial interpolation with one mu*D out of range,
+        # which is computed with brute force. The terms of the polynomials
+        # cancel to about 1e-10 in the matrix product over all mu*D
+        ("polynomial_interpolation", [1, 20, 2.5], 1e-9),
+    ],
+)
+def test_compute_cve_curves(mocker, method, muds, rel):
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 10)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        actual_cves = compute_cve_curves(muds, method=method)
+        expected_cves = [compute_cve_curves(mud, method)[0] for mud in muds]
+    assert actual_cves.shape == (len(muds), len(TTH_GRID))
+    assert actual_cves == pytest.approx(np.array(expected_cves), rel=rel)
+
+
+@pytest.mark.parametrize("muds", [[0.5, 1, 2], [7, 15]])
+def test_compute_cve_curves_path_length_histogram(mocker, muds):
+    # Test that the path-length histogram method agrees with brute force
+    # on the same grid to second order in the bin width
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 20)
+    actual_cves = compute_cve_curves(muds, method="path_length_histogram")
+    expected_cves = compute_cve_curves(muds, method="brute_force")
+    assert actual_cves == pytest.approx(expected_cves, rel=2e-4)
+
+
+def test_get_path_length_histograms():
+    actual_gs = Gridded_circle(radius=1, n_points_on_diameter=10, mu=1)
+    angles = [0, 45, 90, 180]
+    actual_weights, actual_nodes = actual_gs.get_path_length_histograms(
+        angles, n_bins=8
+    )
+    primary, secondary = actual_gs.get_path_lengths(angles)
+    expected_mean_distances = (primary + secondary).sum(axis=1)
+    assert actual_nodes == pytest.approx(np.linspace(0, 4, 9))
+    assert actual_weights.sum(axis=1) == pytest.approx(
+        [actual_gs.total_points_in_grid] * len(angles)
+    )
+    assert actual_weights @ actual_nodes == pytest.approx(
+        expected_mean_distances
+    )
+
+
+@pytest.mark.parametrize("angles", [[0, 30, 90], [120, 150, 180]])
+def test_get_quadrature_points(angles):
+    # Test that the weights are normalized and that the mean primary
+    # and secondary distances over the circle are both 8/(3*pi)
+    x, y, primary, weights = _get_quadrature_points(np.array(angles), 32)
+    angles = np.radians(angles)[:, np.newaxis]
+    secondary = _get_exit_distances(x, y, np.cos(angles), np.sin(angles), 1)
+    expected_mean_distances = [8 / (3 * np.pi)] * len(angles)
+    assert weights.sum(axis=1) == pytest.approx([1] * len(angles))
+    assert (weights * primary).sum(axis=1) == pytest.approx(
+        expected_mean_distances
+    )
+    assert (weights * secondary).sum(axis=1) == pytest.approx(
+        expected_mean_distances
+    )
+
+
+def test_compute_cve_curves_quadrature(mocker):
+    mocker.patch(
+        "diffpy.labpdfproc.functions.TTH_GRID", np.array([1, 45, 90, 180])
+    )
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 600)
+    muds = [0.1, 1, 2]
+    # Test that the quadrature agrees with brute force
+    # within the discretization error of the brute-force grid
+    actual_cves = compute_cve_curves(muds, method="quadrature")
+    expected_cves = compute_cve_curves(muds, method="brute_force")
+    assert actual_cves == pytest.approx(expected_cves, rel=1e-3)
+    # Test that the requested tolerance is reached
+    expected_cves = compute_cve_curves(muds, method="quadrature", rtol=1e-12)
+    actual_cves = compute_cve_curves(muds, method="quadrature", rtol=1e-4)
+    assert actual_cves == pytest.approx(expected_cves, rel=1e-4)
+
+
+@pytest.mark.parametrize(
+    "method", ["brute_force", "path_length_histogram", "quadrature"]
+)
+def test_compute_cve_curves_workers(mocker, method):
+    # Test that splitting the angles across processes
+    # gives exactly the same result as a single process
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 10)
+    mocker.patch("diffpy.labpdfproc.functions._PATH_LENGTH_HISTOGRAMS", {})
+    expected_cves = compute_cve_curves([1, 2], method=method, workers=1)
+    mocker.patch("diffpy.labpdfproc.functions._PATH_LENGTH_HISTOGRAMS", {})
+    actual_cves = compute_cve_curves([1, 2], method=method, workers=3)
+    assert np.array_equal(actual_cves, expected_cves)
+
+
+def test_path_length_histograms_cache(tmp_path, mocker):
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 10)
+    mocker.patch("diffpy.labpdfproc.functions._PATH_LENGTH_HISTOGRAMS", {})
+    mocker.patch("diffpy.labpdfproc.functions.MAX_PATH_LENGTH_HISTOGRAMS", 2)
+    spy = mocker.spy(functions, "_map_over_angles")
+    expected_cves = compute_cve_curves(
+        [1, 2], method="path_length_histogram", cache=tmp_path
+    )
+    assert spy.call_count == 1
+    # C1: new process with an empty memory, expect the distributions
+    # to be loaded from the cache
+    functions._PATH_LENGTH_HISTOGRAMS.clear()
+    actual_cves = compute_cve_curves(
+        [3, 1, 2], method="path_length_histogram", cache=tmp_path
+    )
+    assert spy.call_count == 1
+    assert np.array_equal(actual_cves[1:], expected_cves)
+    # C2: more angle grids than MAX_PATH_LENGTH_HISTOGRAMS,
+    # expect only the most recently used to be kept in memory
+    for angles in [[10, 20], [30, 40], [50, 60]]:
+        compute_cve_curves([1], method="path_length_histogram", angles=angles)
+    assert len(functions._PATH_LENGTH_HISTOGRAMS) == 2
+
+
+def test_compute_cve_monte_carlo(mocker):
+    mocker.patch(
+        "diffpy.labpdfproc.functions.TTH_GRID", np.array([1, 45, 90, 180])
+    )
+    muds = [0.5, 2]
+    expected_cves = compute_cve_curves(muds, method="quadrature", rtol=1e-9)
+    actual_cves, actual_errors = compute_cve_monte_carlo(
+        muds, rtol=1e-3, seed=0
+    )
+    # Test that the requested precision is reached
+    # and that the cve agrees with the quadrature within its error bars
+    assert np.all(actual_errors <= 1e-3 * actual_cves)
+    assert np.all(np.abs(actual_cves - expected_cves) <= 5 * actual_errors)
+    # Test that the results are reproducible for a given seed
+    # and do not depend on the number of workers
+    repeated_cves, repeated_errors = compute_cve_monte_carlo(
+        muds, rtol=1e-3, seed=0, workers=2
+    )
+    assert np.array_equal(repeated_cves, actual_cves)
+    assert np.array_equal(repeated_errors, actual_errors)
+
+
+def test_compute_cve_monte_carlo_time_budget(mocker):
+    # Test that sampling stops and warns when the time budget runs out
+    # before the requested precision is reached
+    mocker.patch(
+        "diffpy.labpdfproc.functions.TTH_GRID", np.array([1, 45, 90, 180])
+    )
+    with pytest.warns(UserWarning, match="stopped before reaching"):
+        actual_cves, actual_errors = compute_cve_monte_carlo(
+            2, rtol=1e-9, time_budget=0, seed=0
+        )
+    assert actual_cves.shape == (1, 4)
+    assert np.all(np.isfinite(actual_cves))
+    # Test that workers are ignored with a time budget, with a warning
+    spy = mocker.spy(functions, "_map_over_angles")
+    with pytest.warns(UserWarning, match="Ignoring workers = 4"):
+        compute_cve_monte_carlo(2, time_budget=10, seed=0, workers=4)
+    assert spy.call_args.kwargs["workers"] == 1
+
+
 def test_compute_cve_bad(mocker):
     xarray, yarray = np.array([90, 90.1, 90.2]), np.array([2, 2, 2])
     expected_cve = np.array([0.5, 0.5, 0.5])
@@ -220,3 +504,547 @@ def test_apply_corr(mocker):
         metadata={"thing1": 1, "thing2": "thing2"},
     )
     assert actual_corr == expected_corr
+
+
+@pytest.mark.parametrize("xtype", ["tth", "2theta", "q", "d"])
+def test_cve_array(xtype):
+    # Test that the cve is the same for the same angles
+    # given as any xtype, and that compute_cve wraps it
+    tth = np.linspace(10, 150, 20)
+    x = {
+        "tth": tth,
+        "2theta": tth,
+        "q": tth_to_q(tth, 1.54),
+        "d": tth_to_d(tth, 1.54),
+    }[xtype]
+    actual_cve = cve_array(x, xtype, 1.54, 2, method="analytic")
+    expected_cve = np.interp(
+        tth, TTH_GRID, compute_cve_curves(2, method="analytic")[0]
+    )
+    assert actual_cve == pytest.approx(expected_cve, rel=1e-12)
+    input_pattern = DiffractionObject(
+        xarray=x,
+        yarray=np.ones(len(x)),
+        xtype=xtype,
+        wavelength=1.54,
+        name="test",
+    )
+    actual_cve_do = compute_cve(input_pattern, 2, method="analytic")
+    assert actual_cve_do.on_tth()[1] == pytest.approx(actual_cve)
+
+
+@pytest.mark.parametrize(
+    "xtype, wavelength, msg",
+    [
+        (
+            "energy",
+            1.54,
+            "Unknown xtype: energy. Allowed xtypes are "
+            "('angle', 'tth', 'twotheta', '2theta', 'd', 'dspace', 'q').",
+        ),
+        (
+            "q",
+            None,
+            "A wavelength is required to convert q to 2theta. "
+            "Please provide the wavelength.",
+        ),
+    ],
+)
+def test_cve_array_bad(xtype, wavelength, msg):
+    with pytest.raises(ValueError, match=re.escape(msg)):
+        cve_array([1, 2, 3], xtype, wavelength, 1)
+
+
+@pytest.mark.parametrize("method", CVE_METHODS)
+def test_cve_stack(mocker, method):
+    # Test that the cves of a stack of patterns with one row of x values
+    # and one mu*D each match those of the patterns one by one,
+    # with each distinct mu*D computed once in a single call
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 10)
+    options = {
+        "tth_grid": make_tth_grid(10, 60, 5),
+        **(
+            {"seed": 1, "rtol": 0, "max_samples": 1000}
+            if method == "monte_carlo"
+            else {}
+        ),
+    }
+    x = np.array([[12, 20.5, 33], [13, 21.5, 34], [14, 22.5, 35]])
+    muds = [1, 2, 1]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected_cves = [
+            cve_array(row, "tth", None, mud, method=method, **options)
+            for row, mud in zip(x, muds)
+        ]
+        spy = mocker.spy(functions, "compute_cve_curves")
+        actual_cves = cve_stack(x, "tth", None, muds, method=method, **options)
+    assert actual_cves == pytest.approx(np.array(expected_cves), rel=1e-9)
+    assert spy.call_count == 1
+    assert spy.call_args.args[0].tolist() == [1, 2]
+
+
+@pytest.mark.parametrize("direct", [False, True])
+@pytest.mark.parametrize(
+    "x, muds, expected_shape",
+    [
+        # C1: shared x values and mu*D, expect one row
+        (np.linspace(10, 60, 5), 2, (1, 5)),
+        # C2: shared x values and one mu*D per pattern
+        (np.linspace(10, 60, 5), [1, 2, 2, 1], (4, 5)),
+        # C3: one row of x values per pattern and a shared mu*D
+        (np.linspace(10, 60, 15).reshape(3, 5), 2, (3, 5)),
+        # C4: one row of x values and one mu*D per pattern
+        (np.linspace(10, 60, 15).reshape(3, 5), [1, 2, 1], (3, 5)),
+    ],
+)
+def test_cve_stack_broadcast(x, muds, expected_shape, direct):
+    actual_cves = cve_stack(
+        x, "tth", None, muds, method="analytic", direct=direct
+    )
+    assert actual_cves.shape == expected_shape
+    expected_cves = [
+        cve_array(row, "tth", None, mud, method="analytic", direct=direct)
+        for row, mud in zip(
+            np.broadcast_to(np.atleast_2d(x), expected_shape),
+            np.broadcast_to(muds, expected_shape[:1]),
+        )
+    ]
+    assert actual_cves == pytest.approx(np.array(expected_cves), rel=1e-12)
+
+
+def test_cve_stack_direct(mocker):
+    # Case: direct evaluation for one row of x values and one mu*D
+    # per pattern
+    # expected: each distinct mu*D is evaluated only at the x values
+    # of the patterns that use it
+    x = np.linspace(10, 60, 12).reshape(4, 3)
+    spy = mocker.spy(functions, "compute_cve_curves")
+    cve_stack(x, "tth", None, [1, 2, 1, 1], method="analytic", direct=True)
+    assert [call.args[0] for call in spy.call_args_list] == [[1], [2]]
+    assert [call.kwargs["angles"].tolist() for call in spy.call_args_list] == [
+        np.sort(x[[0, 2, 3]], axis=None).tolist(),
+        x[1].tolist(),
+    ]
+
+
+def test_cve_stack_bad():
+    with pytest.raises(
+        ValueError,
+        match=re.escape(
+            "The number of mu*D values (2) does not match "
+            "the number of patterns (3)."
+        ),
+    ):
+        cve_stack(np.ones((3, 5)), "tth", None, [1, 2])
+
+
+def test_apply_cve_array():
+    # C1: one pattern, expect a new array
+    actual_intensity = apply_cve_array([2, 4, 6], np.array([0.5, 1, 2]))
+    assert actual_intensity.tolist() == [1, 4, 12]
+    # C2: a stack of patterns on a shared grid corrected in place,
+    # expect the stack itself to be returned and corrected
+    stack = np.array([[2.0, 4.0, 6.0], [4.0, 8.0, 12.0]])
+    actual_intensity = apply_cve_array(stack, np.array([0.5, 1, 2]), out=stack)
+    assert actual_intensity is stack
+    assert stack.tolist() == [[1, 4, 12], [2, 8, 24]]
+    # C3: a stack with one cve per pattern into a caller-provided buffer,
+    # expect the buffer to be filled and the input unchanged
+    out = np.empty((2, 3))
+    cves = np.array([[1, 1, 1], [0.5, 0.5, 0.5]])
+    actual_intensity = apply_cve_array(stack, cves, out=out)
+    assert actual_intensity is out
+    assert out.tolist() == [[1, 4, 12], [1, 4, 12]]
+    assert stack.tolist() == [[1, 4, 12], [2, 8, 24]]
+
+
+def test_apply_corr_inplace():
+    xarray = np.array([90, 90.1, 90.2])
+    input_pattern = DiffractionObject(
+        xarray=xarray,
+        yarray=np.array([2, 2, 2]),
+        xtype="tth",
+        wavelength=1.54,
+        scat_quantity="x-ray",
+        name="test",
+    )
+    absorption_correction = DiffractionObject(
+        xarray=xarray,
+        yarray=np.array([0.5, 1, 2]),
+        xtype="tth",
+        wavelength=1.54,
+        scat_quantity="cve",
+        name="absorption correction, cve, for test",
+    )
+    actual_corr = apply_corr(
+        input_pattern, absorption_correction, inplace=True
+    )
+    assert actual_corr is input_pattern
+    assert input_pattern.on_tth()[1].tolist() == [1, 2, 4]
+    # Correction on different x values, expect a ValueError
+    # and the input unchanged
+    absorption_correction = DiffractionObject(
+        xarray=xarray + 1,
+        yarray=np.array([0.5, 1, 2]),
+        xtype="tth",
+        wavelength=1.54,
+    )
+    with pytest.raises(ValueError):
+        apply_corr(input_pattern, absorption_correction, inplace=True)
+    assert input_pattern.on_tth()[1].tolist() == [1, 2, 4]
+
+
+def test_compute_cve_curves_cache(tmp_path, mocker):
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 50)
+    expected_cves = compute_cve_curves([0.5, 1.5], method="brute_force")
+    # C1: empty cache, expect the cves to be computed and saved
+    actual_cves = compute_cve_curves(
+        [0.5, 1.5], method="brute_force", cache=tmp_path
+    )
+    assert np.allclose(actual_cves, expected_cves)
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+    # C2: cves in the cache, expect only the new mud to be computed
+    spy = mocker.spy(Gridded_circle, "sum_distances_and_muls_at_angles")
+    actual_cves = compute_cve_curves(
+        [1.5, 0.5, 1.0], method="brute_force", cache=tmp_path
+    )
+    assert np.allclose(actual_cves[:2], expected_cves[::-1])
+    assert spy.call_count > 0
+    assert all(call.kwargs["mus"].size == 1 for call in spy.call_args_list)
+    # C3: different grid resolution, expect a cache miss
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 40)
+    compute_cve_curves([0.5], method="brute_force", cache=tmp_path)
+    assert len(list(tmp_path.glob("*.npy"))) == 4
+    # C4: different angle grid, expect a cache miss
+    actual_cves = compute_cve_curves(
+        [0.5], method="brute_force", cache=tmp_path, angles=[10, 20]
+    )
+    assert actual_cves.shape == (1, 2)
+    assert len(list(tmp_path.glob("*.npy"))) == 5
+    # C5: cheap methods, expect no cache files
+    for method in ["analytic", "lookup_table", "polynomial_interpolation"]:
+        compute_cve_curves([2.5], method=method, cache=tmp_path)
+    assert len(list(tmp_path.glob("*.npy"))) == 5
+    # C6: brute-force fallback out of the range of the polynomial tables,
+    # expect the brute-force cve to be cached and reused
+    with pytest.warns(UserWarning, match="out of the acceptable range"):
+        fallback_cves = compute_cve_curves(
+            [20], method="polynomial_interpolation", cache=tmp_path
+        )
+    assert len(list(tmp_path.glob("*.npy"))) == 6
+    assert np.array_equal(
+        compute_cve_curves([20], method="brute_force", cache=tmp_path),
+        fallback_cves,
+    )
+    assert len(list(tmp_path.glob("*.npy"))) == 6
+
+
+def test_compute_cve_memo(mocker):
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 4)
+    spy = mocker.spy(Gridded_circle, "sum_distances_and_muls_at_angles")
+    memo = {}
+    patterns = [
+        DiffractionObject(
+            xarray=xarray,
+            yarray=np.ones(len(xarray)),
+            xtype="tth",
+            wavelength=1.54,
+            scat_quantity="x-ray",
+            name=f"test{i}",
+        )
+        for i, xarray in enumerate(
+            [np.array([10, 20, 30]), np.array([15, 25, 35, 45])]
+        )
+    ]
+    # C1: same mu*D, method and wavelength, expect one computation
+    cve_dos = [
+        compute_cve(pattern, 20, method="brute_force", memo=memo)
+        for pattern in patterns
+    ]
+    expected_cve_dos = [
+        compute_cve(pattern, 20, method="brute_force") for pattern in patterns
+    ]
+    assert len(memo) == 1
+    for cve_do, expected_cve_do in zip(cve_dos, expected_cve_dos):
+        assert cve_do == expected_cve_do
+    assert spy.call_count == 3
+    # C2: different mu*D, expect a new computation
+    compute_cve(patterns[0], 10, method="brute_force", memo=memo)
+    assert len(memo) == 2
+    assert spy.call_count == 4
+
+
+def test_compute_cve_curves_lookup_table(mocker):
+    table = _load_cve_table()
+    # C1: mu*D on the table grid, expect the rows of the table
+    actual_cves = compute_cve_curves([0, 2.1, 15], method="lookup_table")
+    assert np.allclose(actual_cves, table[[0, 7, 50]], rtol=1e-6)
+    # C2: mu*D between the rows of the table,
+    # expect a smooth interpolation of the neighbouring rows
+    actual_cves = compute_cve_curves([2.0, 2.2], method="lookup_table")
+    assert np.all(actual_cves[0] > table[6]) and np.all(
+        actual_cves[0] < table[7]
+    )
+    assert np.all(actual_cves[1] > table[7]) and np.all(
+        actual_cves[1] < table[8]
+    )
+    # C3: angles off the table grid, expect interpolation in 2theta
+    mocker.patch(
+        "diffpy.labpdfproc.functions.TTH_GRID", np.array([1, 10.05, 90])
+    )
+    actual_cves = compute_cve_curves([2.1], method="lookup_table")
+    assert actual_cves[0, [0, 2]] == pytest.approx(table[7, [0, 890]])
+    assert actual_cves[0, 1] == pytest.approx(table[7, 90:92].mean(), rel=1e-6)
+    # C4: mu*D out of the range of the table, expect brute force
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 10)
+    with pytest.warns(UserWarning, match="out of the acceptable range"):
+        actual_cves = compute_cve_curves([16], method="lookup_table")
+    assert np.allclose(actual_cves, compute_cve_curves([16]))
+
+
+@pytest.mark.parametrize(
+    "mud, expected_rel",
+    [  # C1: mu*D = 0, expect no correction
+        (0, 1e-12),
+        # C2: mu*D below 6 (mu*R below 3),
+        # expect the first expression within its accuracy
+        (1, 5e-3),
+        (5, 1.5e-2),
+        # C3: mu*D above 6, expect the second expression within its accuracy
+        (10, 1.5e-2),
+    ],
+)
+def test_compute_cve_curves_analytic(mud, expected_rel):
+    actual_cves = compute_cve_curves(mud, method="analytic")
+    expected_cves = (
+        np.ones((1, len(TTH_GRID)))
+        if mud == 0
+        else compute_cve_curves(mud, method="quadrature", rtol=1e-6)
+    )
+    assert actual_cves == pytest.approx(expected_cves, rel=expected_rel)
+
+
+def test_polynomial_tables_loaded_on_first_use():
+    code = (
+        "import sys\n"
+        "from diffpy.labpdfproc import functions\n"
+        "assert not functions._POLYNOMIAL_TABLES\n"
+        "assert 'pandas' not in sys.modules\n"
+        "assert functions.MULS.shape == functions.TTH_GRID.shape\n"
+        "assert functions.COEFFICIENT_LIST.shape == (7, 8)\n"
+        "assert len(functions.INTERPOLATION_FUNCTIONS) == 7\n"
+        "assert functions.MUD_LIST.tolist() == [0.5, 1, 2, 3, 4, 5, 6, 7]\n"
+        "assert len(functions._POLYNOMIAL_TABLES) == 1\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_compute_cve_curves_polynomial_interpolation_vectorized():
+    from diffpy.labpdfproc.functions import INTERPOLATION_FUNCTIONS, MULS
+
+    muds = np.linspace(0.5, 7, 50)
+    actual_cves = compute_cve_curves(muds, method="polynomial_interpolation")
+    expected_cves = [
+        1 / np.polyval([f(mud) for f in INTERPOLATION_FUNCTIONS], MULS)
+        for mud in muds
+    ]
+    assert actual_cves.shape == (50, len(TTH_GRID))
+    assert actual_cves == pytest.approx(np.array(expected_cves), rel=1e-7)
+
+
+@pytest.mark.parametrize("method", DIRECT_CVE_METHODS)
+def test_compute_cve_direct(method):
+    # Test that the cve evaluated directly at the input angles agrees
+    # with the cve interpolated from the global grid, including angles
+    # off the global grid
+    xarray = np.linspace(2.03, 170.07, 5001)
+    input_pattern = DiffractionObject(
+        xarray=xarray,
+        yarray=np.ones(len(xarray)),
+        xtype="tth",
+        wavelength=1.54,
+        scat_quantity="x-ray",
+        name="test",
+        metadata={},
+    )
+    actual_cve_do = compute_cve(
+        input_pattern, 2.5, method=method, xtype="q", direct=True
+    )
+    expected_cve_do = compute_cve(input_pattern, 2.5, method=method, xtype="q")
+    assert actual_cve_do.on_q()[0] == pytest.approx(input_pattern.on_q()[0])
+    assert actual_cve_do.on_q()[1] == pytest.approx(
+        expected_cve_do.on_q()[1], rel=1e-6
+    )
+    assert actual_cve_do.scat_quantity == "cve"
+
+
+@pytest.mark.parametrize(
+    "method, mud",
+    [  # C1: polynomial interpolation above the range of its tables
+        ("polynomial_interpolation", 10),
+        # C2: lookup table above the range of its table
+        ("lookup_table", 16),
+    ],
+)
+def test_cve_array_direct_out_of_range(mocker, tmp_path, method, mud):
+    # Case: direct evaluation for a mu*D out of the range of the method
+    # expected: the brute-force fallback is computed once on TTH_GRID,
+    # cached, and interpolated onto the input angles
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 10)
+    spy = mocker.spy(functions, "_cve_brute_force")
+    tth = np.linspace(2.03, 170.07, 20001)
+    with pytest.warns(UserWarning, match="out of the acceptable range"):
+        actual_cve = cve_array(
+            tth, "tth", None, mud, method=method, cache=tmp_path, direct=True
+        )
+    assert spy.call_count == 1
+    assert np.array_equal(spy.call_args.kwargs["angles"], TTH_GRID)
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+    expected_cve = np.interp(tth, TTH_GRID, compute_cve_curves([mud])[0])
+    assert actual_cve == pytest.approx(expected_cve, rel=1e-3)
+
+
+def test_compute_cve_curves_direct():
+    # Test that the methods evaluate at the global grid itself
+    # exactly as without angles
+    for method in DIRECT_CVE_METHODS:
+        assert compute_cve_curves(
+            [1, 5], method=method, angles=TTH_GRID
+        ) == pytest.approx(compute_cve_curves([1, 5], method=method))
+    input_pattern = DiffractionObject(
+        xarray=np.array([10, 20]),
+        yarray=np.ones(2),
+        xtype="tth",
+        wavelength=1.54,
+        name="test",
+    )
+    with pytest.raises(
+        ValueError,
+        match=re.escape(
+            "Method brute_force cannot evaluate the cve directly at the "
+            "input angles. Allowed methods are "
+            "('polynomial_interpolation', 'lookup_table', 'analytic')."
+        ),
+    ):
+        compute_cve(input_pattern, 1, method="brute_force", direct=True)
+
+
+@pytest.mark.parametrize(
+    "inputs, expected_grid",
+    [
+        # C1: default arguments, expect the default grid
+        ({}, TTH_GRID),
+        # C2: range not a multiple of the step, expect a shorter last step
+        (
+            {"tth_min": 0.5, "tth_max": 2, "tth_step": 0.4},
+            [0.5, 0.9, 1.3, 1.7, 2],
+        ),
+    ],
+)
+def test_make_tth_grid(inputs, expected_grid):
+    actual_grid = make_tth_grid(**inputs)
+    assert actual_grid == pytest.approx(expected_grid, abs=1e-12)
+
+
+@pytest.mark.parametrize(
+    "inputs, msg",
+    [
+        (
+            {"tth_min": 10, "tth_max": 5},
+            "Invalid 2theta range from 10 to 5. "
+            "Please make sure that 0 <= minimum < maximum <= 180.",
+        ),
+        (
+            {"tth_max": 190},
+            "Invalid 2theta range from 1 to 190. "
+            "Please make sure that 0 <= minimum < maximum <= 180.",
+        ),
+        (
+            {"tth_step": 0},
+            "Invalid 2theta step 0. Please provide a positive step.",
+        ),
+    ],
+)
+def test_make_tth_grid_bad(inputs, msg):
+    with pytest.raises(ValueError, match=re.escape(msg)):
+        make_tth_grid(**inputs)
+
+
+@pytest.mark.parametrize(
+    "tth, tth_step, expected_ends",
+    [
+        # C1: ends rounded outward to multiples of the step
+        ([5.03, 60, 119.97], 0.1, [5, 120]),
+        # C2: ends already on multiples of the step
+        ([0, 180], 1, [0, 180]),
+        # C3: a single angle, expect one step around it
+        ([3, 3], 0.5, [3, 3.5]),
+    ],
+)
+def test_fit_tth_grid(tth, tth_step, expected_ends):
+    actual_grid = fit_tth_grid(tth, tth_step)
+    assert [actual_grid[0], actual_grid[-1]] == pytest.approx(expected_ends)
+    assert np.diff(actual_grid) == pytest.approx(tth_step)
+
+
+def test_compute_cve_tth_grid(mocker):
+    # Test that brute force on a grid fitted to the data only computes
+    # the needed angles and agrees with the default grid
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 20)
+    input_pattern = DiffractionObject(
+        xarray=np.linspace(20.03, 29.97, 50),
+        yarray=np.ones(50),
+        xtype="tth",
+        wavelength=1.54,
+        name="test",
+    )
+    spy = mocker.spy(Gridded_circle, "sum_distances_and_muls_at_angles")
+    actual_cve_do = compute_cve(
+        input_pattern, 2, method="brute_force", tth_grid="fit"
+    )
+    computed_angles = np.concatenate(
+        [call.args[1] for call in spy.call_args_list]
+    )
+    assert computed_angles == pytest.approx(make_tth_grid(20, 30))
+    expected_cve_do = compute_cve(input_pattern, 2, method="brute_force")
+    assert actual_cve_do.on_tth()[1] == pytest.approx(
+        expected_cve_do.on_tth()[1], rel=1e-12
+    )
+    with pytest.raises(
+        ValueError,
+        match=re.escape(
+            "Unknown 2theta grid: full. "
+            "Please provide an array of angles or 'fit'."
+        ),
+    ):
+        compute_cve(input_pattern, 2, tth_grid="full")
+
+
+@pytest.mark.parametrize(
+    "tth, tth_grid, expect_warning",
+    [  # C1: angles within the grid, expect no warning
+        (np.linspace(10, 100, 50), make_tth_grid(10, 100), False),
+        # C2: angles past the end of the grid, expect a warning
+        (np.linspace(5, 120, 50), make_tth_grid(10, 100), True),
+        # C3: angles below the default grid, expect a warning
+        (np.linspace(0.5, 20, 50), None, True),
+    ],
+)
+def test_cve_array_outside_grid(tth, tth_grid, expect_warning):
+    with warnings.catch_warnings(record=True) as record:
+        warnings.simplefilter("always")
+        cve_array(tth, "tth", None, 2, method="analytic", tth_grid=tth_grid)
+        cve_stack(tth, "tth", None, 2, method="analytic", tth_grid=tth_grid)
+    messages = [str(warning.message) for warning in record]
+    expected_message = (
+        f"The 2theta values from {tth[0]:g} to {tth[-1]:g} degrees extend "
+        f"past the 2theta grid"
+    )
+    if expect_warning:
+        assert len(messages) == 2
+        assert all(
+            message.startswith(expected_message) for message in messages
+        )
+    else:
+        assert messages == []
@@ -0,0 +1,170 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from diffpy.labpdfproc import labpdfprocapp
+from diffpy.labpdfproc.constants import XTYPES
+from diffpy.labpdfproc.labpdfprocapp import (
+    apply_absorption_correction,
+    get_args_cli,
+)
+from diffpy.labpdfproc.tools import preprocessing_args
+from diffpy.utils.diffraction_objects import XQUANTITIES
+
+# Budget in seconds for importing the command-line application,
+# about a tenth of the time it takes with GUI and numerical dependencies
+IMPORT_TIME_BUDGET = 0.75
+HEAVY_MODULES = ["gooey", "wx", "numpy", "scipy", "pandas", "diffpy.utils"]
+
+
+def _run_python(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_xtypes():
+    assert XTYPES == list(XQUANTITIES)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [  # C1: importing the application
+        "import diffpy.labpdfproc.labpdfprocapp",
+        # C2: printing the help of the application and of a command
+        "from diffpy.labpdfproc.labpdfprocapp import get_args_cli\n"
+        "for argv in [['--help'], ['mud', '--help']]:\n"
+        "    try:\n"
+        "        get_args_cli(argv)\n"
+        "    except SystemExit:\n"
+        "        pass\n",
+    ],
+)
+def test_heavy_modules_not_imported(code):
+    check = (
+        "\nimport sys\n"
+        f"heavy_modules = {HEAVY_MODULES}\n"
+        "print([name for name in heavy_modules if name in sys.modules])"
+    )
+    result = _run_python(code + check)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_import_time():
+    result = _run_python(
+        "import diffpy.labpdfproc.labpdfprocapp", "-X", "importtime"
+    )
+    # Lines are "import time: self [us] | cumulative [us] | module"
+    cumulative_times = {
+        line.split("|")[2].strip(): int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+        and line.count("|") == 2
+        and not line.split("|")[1].strip().startswith("cumulative")
+    }
+    import_time = cumulative_times["diffpy.labpdfproc.labpdfprocapp"] / 1e6
+    assert import_time < IMPORT_TIME_BUDGET
+
+
+@pytest.mark.parametrize(
+    "options", [["--jobs", "1"], ["--jobs", "2"], ["--stream"]]
+)
+def test_apply_absorption_correction_batch(
+    user_filesystem, monkeypatch, capsys, options
+):
+    # Case: user corrects a good file, a file that cannot be loaded
+    # and two other good files, the first and last with another mu*D,
+    # in one process, several processes or a streaming pipeline
+    # expected: the good files are corrected, the log lines are printed
+    # in input order, and the bad file is reported
+    cwd = Path(user_filesystem)
+    os.chdir(cwd)
+    for name in ["other_data.xy", "third_data.xy"]:
+        (cwd / name).write_text((cwd / "good_data.xy").read_text())
+    (cwd / "manifest.csv").write_text(
+        "file,mud\ninput_dir/good_data.chi,3\nthird_data.xy,3\n"
+    )
+    args = get_args_cli(
+        [
+            "mud",
+            "input_dir/good_data.chi",
+            "unreadable_file.txt",
+            "other_data.xy",
+            "third_data.xy",
+            "2.5",
+            "-m",
+            "analytic",
+            "--manifest",
+            "manifest.csv",
+            "-o",
+            "out",
+            "-c",
+            *options,
+        ]
+    )
+    with monkeypatch.context() as m:
+        m.setattr("pathlib.Path.home", lambda _: cwd / "home_dir")
+        args = preprocessing_args(args)
+    failed_paths = apply_absorption_correction(args)
+    assert failed_paths == [cwd / "unreadable_file.txt"]
+    out_dir = (cwd / "out").resolve()
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        f"Saved corrected data to {out_dir / 'good_data-mud-corrected.chi'}",
+        f"Saved correction data to {out_dir / 'good_data-cve.chi'}",
+        f"Saved corrected data to {out_dir / 'other_data-mud-corrected.chi'}",
+        f"Saved correction data to {out_dir / 'other_data-cve.chi'}",
+        f"Saved corrected data to {out_dir / 'third_data-mud-corrected.chi'}",
+        f"Saved correction data to {out_dir / 'third_data-cve.chi'}",
+    ]
+    assert captured.err.startswith(
+        f"Failed to correct {cwd / 'unreadable_file.txt'}: "
+    )
+
+
+def test_apply_absorption_correction_stream_bounded(
+    user_filesystem, monkeypatch
+):
+    # Case: user corrects many files with --stream
+    # expected: the files read ahead of the file being written
+    # are bounded by the queue sizes
+    cwd = Path(user_filesystem)
+    os.chdir(cwd)
+    data = (cwd / "good_data.xy").read_text()
+    for i in range(12):
+        (cwd / "input_dir" / f"data{i:02d}.xy").write_text(data)
+    args = get_args_cli(
+        ["mud", "input_dir/data*.xy", "2.5", "-m", "analytic", "--stream"]
+    )
+    args.output_directory = cwd / "out"
+    with monkeypatch.context() as m:
+        m.setattr("pathlib.Path.home", lambda _: cwd / "home_dir")
+        args = preprocessing_args(args)
+    monkeypatch.setattr(labpdfprocapp, "STREAM_QUEUE_SIZE", 1)
+    n_loaded, n_loaded_when_saved = [0], []
+    load_xy, save_outputs = labpdfprocapp._load_xy, labpdfprocapp._save_outputs
+
+    def counting_load_xy(path):
+        n_loaded[0] += 1
+        return load_xy(path)
+
+    def counting_save_outputs(path, outputs, args):
+        n_loaded_when_saved.append(n_loaded[0])
+        return save_outputs(path, outputs, args)
+
+    monkeypatch.setattr(labpdfprocapp, "_load_xy", counting_load_xy)
+    monkeypatch.setattr(labpdfprocapp, "_save_outputs", counting_save_outputs)
+    assert apply_absorption_correction(args) == []
+    assert len(n_loaded_when_saved) == 12
+    # The file being saved, one file in each of the two queues,
+    # and one file held by each of the reader and correcting threads
+    assert all(
+        n_loaded - n_saved <= 5
+        for n_saved, n_loaded in enumerate(n_loaded_when_saved)
+    )
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from diffpy.labpdfproc.loaders import load_pattern
+from diffpy.utils.parsers import load_data
+
+
+def _rows(n_rows, n_columns=2):
+    return "".join(
+        " ".join([f"{i + 0.5}"] * n_columns) + "\n" for i in range(n_rows)
+    )
+
+
+@pytest.mark.parametrize(
+    "text, fast_path",
+    [
+        # C1: .chi file with a header and two columns
+        # expect the fast path
+        ("dataformat = twotheta\nmode = xray\n# 2theta I\n" + _rows(20), True),
+        # C2: .xye file with three columns and no header
+        # expect the fast path
+        (_rows(15, 3), True),
+        # C3: Windows line endings
+        # expect the fast path
+        ("# header\r\n" + _rows(15).replace("\n", "\r\n"), True),
+        # C4: blank lines and comments in the data block,
+        # and a short block of numbers in the header
+        # expect the fast path
+        (
+            "500\n1 2\n# header\n\n" + _rows(12) + "# comment\n\n" + _rows(3),
+            True,
+        ),
+        # C5: fewer rows than MIN_ROWS
+        # expect load_data
+        ("dataformat = twotheta\n1 2\n3 4\n", False),
+        # C6: four columns
+        # expect load_data
+        (_rows(20, 4), False),
+        # C7: one column
+        # expect load_data
+        (_rows(20, 1), False),
+        # C8: lines separated by lone carriage returns
+        # expect load_data
+        ("# header\r" + _rows(12).replace("\n", "\r"), False),
+    ],
+)
+def test_load_pattern(tmp_path, mocker, text, fast_path):
+    filepath = tmp_path / "pattern.xy"
+    with open(filepath, "w", newline="") as f:
+        f.write(text)
+    expected = load_data(filepath, unpack=True)
+    fallback = mocker.patch("diffpy.utils.parsers.load_data", wraps=load_data)
+    actual = load_pattern(filepath)
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual, expected)
+    assert fallback.called != fast_path
@@ -0,0 +1,110 @@
+import re
+
+import numpy as np
+import pytest
+
+from diffpy.labpdfproc import tables
+from diffpy.labpdfproc.functions import (
+    POLYNOMIAL_TABLES_FILE,
+    _load_cve_table,
+    compute_cve_curves,
+    load_polynomial_tables,
+)
+from diffpy.labpdfproc.tables import (
+    build_cve_table,
+    build_polynomial_tables,
+    compute_brute_force_muls,
+)
+
+
+def test_compute_brute_force_muls_resume(tmp_path, mocker):
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 20)
+    expected_muls = 1 / compute_cve_curves([0.5, 1, 2])
+    spy = mocker.spy(tables, "_map_over_angles")
+    # C1: no checkpoints, expect all mu*D values to be computed and saved
+    actual_muls = compute_brute_force_muls(
+        [0.5, 1], n_points_on_diameter=20, checkpoint_dir=tmp_path
+    )
+    assert np.allclose(actual_muls, expected_muls[:2])
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+    assert spy.call_args.kwargs["args"][1].tolist() == [0.25, 0.5]
+    # C2: resumed run, expect only the new mu*D value to be computed
+    actual_muls = compute_brute_force_muls(
+        [0.5, 1, 2],
+        n_points_on_diameter=20,
+        checkpoint_dir=tmp_path,
+        checkpoint_every=1,
+    )
+    assert np.allclose(actual_muls, expected_muls)
+    assert spy.call_count == 2
+    assert spy.call_args.kwargs["args"][1].tolist() == [1.0]
+
+
+def test_build_polynomial_tables(tmp_path, mocker):
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 20)
+    muds = [3, 0.2, 1, 2]
+    fit_errors = build_polynomial_tables(
+        muds, tmp_path, n_points_on_diameter=20
+    )
+    assert fit_errors.shape == (4,)
+    assert np.all(fit_errors < 1e-3)
+    assert (tmp_path / POLYNOMIAL_TABLES_FILE).is_file()
+    mud_list, _, _ = load_polynomial_tables(tmp_path)
+    assert mud_list.tolist() == [0.2, 1, 2, 3]
+    # The polynomial method with the new tables reproduces brute force
+    # at the mu*D values of the tables and interpolates between them
+    test_muds = [0.2, 1, 1.5, 3]
+    actual_cves = compute_cve_curves(
+        test_muds, method="polynomial_interpolation", tables_dir=tmp_path
+    )
+    expected_cves = compute_cve_curves(test_muds, method="brute_force")
+    assert actual_cves[[0, 1, 3]] == pytest.approx(
+        expected_cves[[0, 1, 3]], rel=1e-3
+    )
+    assert actual_cves[2] == pytest.approx(expected_cves[2], rel=2e-2)
+    # Out of the range of the tables, expect brute force with a warning
+    with pytest.warns(UserWarning, match=re.escape("(0.2 to 3.0)")):
+        actual_cves = compute_cve_curves(
+            [5], method="polynomial_interpolation", tables_dir=tmp_path
+        )
+    assert np.allclose(actual_cves, compute_cve_curves([5]))
+
+
+def test_build_polynomial_tables_fit_error_warning(tmp_path, mocker):
+    # Case: wide mu*D range with the default reference mu*D and degree
+    # expected: a warning naming the mu*D values with a poor fit
+    mocker.patch("diffpy.labpdfproc.functions.N_POINTS_ON_DIAMETER", 20)
+    with pytest.warns(UserWarning, match=r"exceeds 0.01 for mu\*D = .*15"):
+        fit_errors = build_polynomial_tables(
+            [0.5, 1, 7, 15], tmp_path, n_points_on_diameter=20
+        )
+    assert fit_errors[-1] > tables.FIT_ERROR_THRESHOLD
+
+
+def test_build_polynomial_tables_bad(tmp_path):
+    with pytest.raises(
+        ValueError,
+        match=re.escape(
+            "At least three distinct mu*D values are required "
+            "to interpolate the polynomial coefficients, "
+            "but 2 were given."
+        ),
+    ):
+        build_polynomial_tables([1, 2, 2], tmp_path)
+    with pytest.raises(
+        FileNotFoundError, match="Cannot find polynomial tables"
+    ):
+        load_polynomial_tables(tmp_path)
+
+
+def test_build_cve_table(tmp_path):
+    # Case: build the first rows of the lookup table
+    # expected: the quadrature cve, as in the table shipped with the package
+    build_cve_table(tmp_path / "cve_table.npy", mud_max=0.9)
+    actual_table = np.load(tmp_path / "cve_table.npy")
+    assert actual_table.dtype == np.float32
+    expected_table = compute_cve_curves(
+        [0, 0.3, 0.6, 0.9], method="quadrature"
+    )
+    assert actual_table == pytest.approx(expected_table, rel=1e-7)
+    assert actual_table == pytest.approx(_load_cve_table()[:4], rel=1e-6)
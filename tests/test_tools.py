@@ -15,6 +15,7 @@ from diffpy.labpdfproc.tools import (
     load_wavelength_from_config_file,
     normalize_wavelength,
     preprocessing_args,
+    set_file_parameters,
     set_input_lists,
     set_mud,
     set_output_directory,
@@ -882,3 +883,237 @@ def test_preprocess_args_bad(user_filesystem, monkeypatch):
     )
     with pytest.raises(FileExistsError, match=re.escape(msg)):
         preprocessing_args(args)
+
+
+@pytest.mark.parametrize(
+    "options, manifest, expected_error_msg",
+    [
+        # C1: --direct with a method on the command line
+        # that cannot evaluate the cve directly
+        # expect an error for the method
+        (
+            ["-m", "brute_force"],
+            None,
+            "Method brute_force cannot evaluate the cve directly at the "
+            "input angles. Allowed methods are "
+            "('polynomial_interpolation', 'lookup_table', 'analytic').",
+        ),
+        # C2: --direct with such a method for one file in the manifest
+        # expect an error for the method and the file
+        (
+            ["-m", "lookup_table"],
+            "file,method\ngood_data.xy,quadrature\n",
+            "Method quadrature cannot evaluate the cve directly at the "
+            "input angles for {cwd}/good_data.xy. Allowed methods are "
+            "('polynomial_interpolation', 'lookup_table', 'analytic').",
+        ),
+    ],
+)
+def test_preprocess_args_direct_bad(
+    user_filesystem, monkeypatch, options, manifest, expected_error_msg
+):
+    cwd = Path(user_filesystem)
+    os.chdir(cwd)
+    monkeypatch.setattr("pathlib.Path.home", lambda _: cwd / "home_dir")
+    cli_inputs = [
+        "mud",
+        "good_data.chi",
+        "good_data.xy",
+        "2.5",
+        "-w",
+        "Mo",
+        "-o",
+        "direct_output",
+        "--direct",
+    ] + options
+    if manifest is not None:
+        (cwd / "manifest.csv").write_text(manifest)
+        cli_inputs += ["--manifest", "manifest.csv"]
+    args = get_args_cli(cli_inputs)
+    with pytest.raises(
+        ValueError, match=re.escape(expected_error_msg.format(cwd=cwd))
+    ):
+        preprocessing_args(args)
+
+
+@pytest.mark.parametrize(
+    "manifest_name, manifest, header, options, expected",
+    [
+        # C1: no manifest or header parameters
+        # expect the command line parameters for all files
+        (
+            None,
+            None,
+            "",
+            [],
+            [
+                {"mud": 2.5, "wavelength": 0.71073, "method": "lookup_table"},
+                {"mud": 2.5, "wavelength": 0.71073, "method": "lookup_table"},
+            ],
+        ),
+        # C2: CSV manifest with mu*D of one file and wavelength of the other
+        # expect the manifest values, empty cells ignored
+        (
+            "manifest.csv",
+            "file,mud,wavelength\ngood_data.chi,1.2,\ngood_data.xy,,Cu\n",
+            "",
+            [],
+            [
+                {"mud": 1.2, "wavelength": 0.71073, "method": "lookup_table"},
+                {"mud": 2.5, "wavelength": 1.54184, "method": "lookup_table"},
+            ],
+        ),
+        # C3: JSON manifest with method and sample parameters
+        # expect mu*D computed from the sample parameters
+        (
+            "manifest.json",
+            json.dumps(
+                [
+                    {"file": "good_data.chi", "method": "analytic"},
+                    {
+                        "file": "good_data.xy",
+                        "sample_composition": "ZrO2",
+                        "sample_mass_density": 1.745,
+                        "diameter": 2,
+                    },
+                ]
+            ),
+            "",
+            [],
+            [
+                {"mud": 2.5, "wavelength": 0.71073, "method": "analytic"},
+                {
+                    "mud": pytest.approx(4.3321, abs=1e-4),
+                    "wavelength": 0.71073,
+                    "method": "lookup_table",
+                },
+            ],
+        ),
+        # C4: header parameters, replaced by the manifest
+        # expect header values where the manifest has none
+        (
+            "manifest.csv",
+            "file,mud\ngood_data.chi,1.2\n",
+            "# mud = 3.0\n# wavelength = 0.5\n",
+            ["--header-parameters"],
+            [
+                {"mud": 1.2, "wavelength": 0.5, "method": "lookup_table"},
+                {"mud": 3.0, "wavelength": 0.5, "method": "lookup_table"},
+            ],
+        ),
+    ],
+)
+def test_set_file_parameters(
+    user_filesystem, manifest_name, manifest, header, options, expected
+):
+    cwd = Path(user_filesystem)
+    os.chdir(cwd)
+    for name in ["good_data.chi", "good_data.xy"]:
+        data = (cwd / name).read_text()
+        (cwd / name).write_text(header + data)
+    cli_inputs = [
+        "mud",
+        "good_data.chi",
+        "good_data.xy",
+        "2.5",
+        "-w",
+        "Mo",
+        "-m",
+        "lookup_table",
+    ] + options
+    if manifest_name is not None:
+        (cwd / manifest_name).write_text(manifest)
+        cli_inputs += ["--manifest", manifest_name]
+    args = get_args_cli(cli_inputs)
+    args = set_input_lists(args)
+    args = set_wavelength(args)
+    args = set_file_parameters(args)
+    actual = dict(zip(args.input_paths, args.file_parameters))
+    assert [
+        actual[cwd / name] for name in ["good_data.chi", "good_data.xy"]
+    ] == expected
+
+
+@pytest.mark.parametrize(
+    "manifest, expected_error_msg",
+    [
+        # C1: unknown parameter in the manifest
+        # expect unknown parameter error
+        (
+            "file,mu\ngood_data.chi,1.2\n",
+            "Unknown parameters \\('mu',\\) in .*manifest.csv. "
+            "Allowed parameters are .*",
+        ),
+        # C2: unknown method in the manifest
+        # expect unknown method error
+        (
+            "file,method\ngood_data.chi,fast\n",
+            "Unknown method fast for .*good_data.chi. "
+            "Allowed methods are .*",
+        ),
+        # C3: incomplete sample parameters in the manifest
+        # expect mu*D error
+        (
+            "file,sample_composition\ngood_data.chi,ZrO2\n",
+            "Cannot compute mu\\*D for .*good_data.chi. Please provide .*",
+        ),
+        # C4: manifest without file column
+        # expect invalid manifest error
+        (
+            "mud\n1.2\n",
+            "Invalid manifest .*manifest.csv. Please provide a list of "
+            "entries, each with a 'file' and its correction parameters.",
+        ),
+    ],
+)
+def test_set_file_parameters_bad(
+    user_filesystem, manifest, expected_error_msg
+):
+    cwd = Path(user_filesystem)
+    os.chdir(cwd)
+    (cwd / "manifest.csv").write_text(manifest)
+    args = get_args_cli(
+        [
+            "mud",
+            "good_data.chi",
+            "2.5",
+            "-w",
+            "Mo",
+            "--manifest",
+            "manifest.csv",
+        ]
+    )
+    args = set_input_lists(args)
+    args = set_wavelength(args)
+    with pytest.raises(ValueError, match=expected_error_msg):
+        set_file_parameters(args)
+
+
+def test_set_file_parameters_unmatched(user_filesystem):
+    # Case: the manifest has an entry for a file that is not an input
+    # expected: a warning naming the file
+    cwd = Path(user_filesystem)
+    os.chdir(cwd)
+    (cwd / "manifest.csv").write_text("file,mud\nmissing.xy,1.2\n")
+    args = get_args_cli(
+        [
+            "mud",
+            "good_data.chi",
+            "2.5",
+            "-w",
+            "Mo",
+            "--manifest",
+            "manifest.csv",
+        ]
+    )
+    args = set_input_lists(args)
+    args = set_wavelength(args)
+    with pytest.warns(UserWarning, match="missing.xy"):
+        args = set_file_parameters(args)
+    assert args.file_parameters == [
+        {
+            "mud": 2.5,
+            "wavelength": 0.71073,
+            "method": "polynomial_interpolation",
+        }
+    ]